@@ -0,0 +1,29 @@
+"""add pagination indexes
+
+Revision ID: 3f1c2a7d9b41
+Revises: ebedb6fefab3
+Create Date: 2026-10-18 10:12:31.402118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a7d9b41'
+down_revision = 'ebedb6fefab3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # keyset pagination orders each collection by these columns within its parent
+    op.create_index('ix_boards_owner_id_id', 'boards', ['owner_id', 'id'])
+    op.create_index('ix_cards_list_id_position_id', 'cards', ['list_id', 'position', 'id'])
+    op.create_index('ix_comments_card_id_created_at_id', 'comments', ['card_id', 'created_at', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_comments_card_id_created_at_id', table_name='comments')
+    op.drop_index('ix_cards_list_id_position_id', table_name='cards')
+    op.drop_index('ix_boards_owner_id_id', table_name='boards')
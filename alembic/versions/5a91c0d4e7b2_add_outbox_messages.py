@@ -0,0 +1,36 @@
+"""add outbox messages
+
+Revision ID: 5a91c0d4e7b2
+Revises: d2a6f3b8e417
+Create Date: 2026-10-18 18:10:42.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a91c0d4e7b2'
+down_revision = 'd2a6f3b8e417'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('outbox_messages',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('recipient', sa.String(), nullable=False),
+                    sa.Column('subject', sa.String(), nullable=False),
+                    sa.Column('body', sa.String(), nullable=False),
+                    sa.Column('attempts', sa.Integer(), server_default=sa.text('0'), nullable=False),
+                    sa.Column('next_attempt_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=True),
+                    sa.Column('sent_at', sa.TIMESTAMP(timezone=True), nullable=True),
+                    sa.Column('last_error', sa.String(), nullable=True),
+                    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+                    sa.PrimaryKeyConstraint('id'))
+    op.create_index('ix_outbox_messages_next_attempt_at', 'outbox_messages', ['next_attempt_at'], postgresql_where=sa.text('sent_at IS NULL AND next_attempt_at IS NOT NULL'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_outbox_messages_next_attempt_at', table_name='outbox_messages')
+    op.drop_table('outbox_messages')
@@ -0,0 +1,41 @@
+"""add foreign key indexes
+
+Revision ID: 8c4d17e2a5f0
+Revises: 3f1c2a7d9b41
+Create Date: 2026-10-18 11:40:05.918334
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c4d17e2a5f0'
+down_revision = '3f1c2a7d9b41'
+branch_labels = None
+depends_on = None
+
+
+# comments.card_id and boards.owner_id are already leading columns of the pagination indexes
+INDEXES = [
+    ('ix_comments_user_id', 'comments', ['user_id']),
+    ('ix_board_members_board_id', 'board_members', ['board_id']),
+    ('ix_card_members_card_id', 'card_members', ['card_id']),
+    ('ix_cards_due_date', 'cards', ['due_date']),
+    ('ix_lists_board_id_position', 'lists', ['board_id', 'position']),
+]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction. A failed concurrent build
+    # leaves an INVALID index behind, so drop it first to make the migration re-runnable.
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
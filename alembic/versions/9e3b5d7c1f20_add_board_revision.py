@@ -0,0 +1,25 @@
+"""add board revision
+
+Revision ID: 9e3b5d7c1f20
+Revises: 5a91c0d4e7b2
+Create Date: 2026-10-18 19:02:17.530946
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e3b5d7c1f20'
+down_revision = '5a91c0d4e7b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # constant default, no table rewrite
+    op.add_column('boards', sa.Column('revision', sa.BigInteger(), server_default=sa.text('0'), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('boards', 'revision')
@@ -0,0 +1,39 @@
+"""add search indexes
+
+Revision ID: b7e90a3c6d12
+Revises: 8c4d17e2a5f0
+Create Date: 2026-10-18 13:05:47.220914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e90a3c6d12'
+down_revision = '8c4d17e2a5f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    with op.get_context().autocommit_block():
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS ix_boards_name_trgm')
+        op.create_index('ix_boards_name_trgm', 'boards', ['name'], postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}, postgresql_concurrently=True)
+        # expression indexes instead of stored vector columns, adding those would rewrite both tables under an exclusive lock.
+        # The expressions have to stay identical to models.card_search_vector/english_vector for the planner to use them.
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS ix_cards_search_vector')
+        op.create_index('ix_cards_search_vector', 'cards', 
+                        [sa.text("(setweight(to_tsvector('english', coalesce(title, '')), 'A') || setweight(to_tsvector('english', coalesce(description, '')), 'B'))")], 
+                        postgresql_using='gin', postgresql_concurrently=True)
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS ix_comments_search_vector')
+        op.create_index('ix_comments_search_vector', 'comments', [sa.text("to_tsvector('english', comment_text)")], postgresql_using='gin', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_comments_search_vector', table_name='comments', postgresql_concurrently=True)
+        op.drop_index('ix_cards_search_vector', table_name='cards', postgresql_concurrently=True)
+        op.drop_index('ix_boards_name_trgm', table_name='boards', postgresql_concurrently=True)
@@ -0,0 +1,39 @@
+"""add board changes
+
+Revision ID: c48f1e9a7b35
+Revises: 9e3b5d7c1f20
+Create Date: 2026-10-18 19:40:55.204817
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c48f1e9a7b35'
+down_revision = '9e3b5d7c1f20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('board_changes',
+                    sa.Column('seq', sa.BigInteger(), nullable=False),
+                    sa.Column('board_id', sa.Integer(), nullable=False),
+                    sa.Column('revision', sa.BigInteger(), nullable=False),
+                    sa.Column('entity', sa.String(), nullable=False),
+                    sa.Column('entity_id', sa.String(), nullable=False),
+                    sa.Column('deleted', sa.Boolean(), server_default=sa.text('false'), nullable=False),
+                    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+                    sa.ForeignKeyConstraint(['board_id'], ['boards.id'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('seq'))
+    op.create_index('ix_board_changes_board_id_seq', 'board_changes', ['board_id', 'seq'])
+    op.create_index('ix_board_changes_created_at', 'board_changes', ['created_at'])
+    op.add_column('boards', sa.Column('changes_pruned_through', sa.BigInteger(), server_default=sa.text('0'), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('boards', 'changes_pruned_through')
+    op.drop_index('ix_board_changes_created_at', table_name='board_changes')
+    op.drop_index('ix_board_changes_board_id_seq', table_name='board_changes')
+    op.drop_table('board_changes')
@@ -0,0 +1,83 @@
+"""add fractional ranks
+
+Revision ID: d2a6f3b8e417
+Revises: b7e90a3c6d12
+Create Date: 2026-10-18 15:21:09.664370
+
+"""
+from itertools import groupby
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a6f3b8e417'
+down_revision = 'b7e90a3c6d12'
+branch_labels = None
+depends_on = None
+
+
+# Copy of ranking.spread as of this revision, the migration must not change with the application code
+DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+BASE = len(DIGITS)
+WIDTH = 6
+
+
+def encode(value: int, width: int):
+    digits = []
+    for _ in range(width):
+        value, remainder = divmod(value, BASE)
+        digits.append(DIGITS[remainder])
+    return "".join(reversed(digits)).rstrip("0")
+
+
+def spread(n: int):
+    width = WIDTH
+    while BASE ** width <= n:
+        width += 1
+    gap = BASE ** width // (n + 1)
+    return [encode(gap * (i + 1), width) for i in range(n)]
+
+
+def backfill_ranks(table: str, parent: str):
+    connection = op.get_bind()
+    rows = connection.execute(sa.text(f'SELECT id, {parent} FROM {table} ORDER BY {parent}, position, id')).all()
+    for _, group in groupby(rows, key=lambda row: row[1]):
+        ids = [row[0] for row in group]
+        connection.execute(sa.text(f'UPDATE {table} SET rank = :rank WHERE id = :id'), 
+                           [{"id": id, "rank": rank} for id, rank in zip(ids, spread(len(ids)))])
+
+
+def upgrade() -> None:
+    op.add_column('lists', sa.Column('rank', sa.String(collation='C'), nullable=True))
+    op.add_column('cards', sa.Column('rank', sa.String(collation='C'), nullable=True))
+    backfill_ranks('lists', 'board_id')
+    backfill_ranks('cards', 'list_id')
+    op.alter_column('lists', 'rank', nullable=False)
+    op.alter_column('cards', 'rank', nullable=False)
+
+    # position stops being part of the key, moves only rewrite the rank
+    op.drop_constraint('lists_pkey', 'lists', type_='primary')
+    op.create_primary_key('lists_pkey', 'lists', ['id'])
+    op.drop_constraint('cards_pkey', 'cards', type_='primary')
+    op.create_primary_key('cards_pkey', 'cards', ['id'])
+
+    op.create_unique_constraint('uq_lists_board_id_rank', 'lists', ['board_id', 'rank'], deferrable=True, initially='IMMEDIATE')
+    op.create_unique_constraint('uq_cards_list_id_rank', 'cards', ['list_id', 'rank'], deferrable=True, initially='IMMEDIATE')
+    # cards are paginated by (list_id, rank) now, which the constraint's index covers
+    op.drop_index('ix_cards_list_id_position_id', table_name='cards')
+
+
+def downgrade() -> None:
+    op.create_index('ix_cards_list_id_position_id', 'cards', ['list_id', 'position', 'id'])
+    op.drop_constraint('uq_cards_list_id_rank', 'cards', type_='unique')
+    op.drop_constraint('uq_lists_board_id_rank', 'lists', type_='unique')
+
+    op.drop_constraint('cards_pkey', 'cards', type_='primary')
+    op.create_primary_key('cards_pkey', 'cards', ['position', 'list_id'])
+    op.drop_constraint('lists_pkey', 'lists', type_='primary')
+    op.create_primary_key('lists_pkey', 'lists', ['position', 'board_id'])
+
+    op.drop_column('cards', 'rank')
+    op.drop_column('lists', 'rank')
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import smtplib
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.concurrency import run_in_threadpool
+
+from . import mailer
+from .config import settings
+from .database import SessionLocal
+from .crud import cards_crud, changes_crud, lists_crud, outbox_crud
+
+
+logger = logging.getLogger(__name__)
+
+tasks = []
+
+
+async def run_periodically(interval: float, func):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(func)
+        except Exception:
+            logger.exception("background task %s failed", func.__name__)
+
+
+def rebalance_ranks():
+    db = SessionLocal()
+    try:
+        lists_crud.rebalance_ranks(db, settings.rank_max_length)
+        cards_crud.rebalance_ranks(db, settings.rank_max_length)
+    finally:
+        db.close()
+
+
+def prune_changes():
+    db = SessionLocal()
+    try:
+        changes_crud.prune_changes(db, settings.change_retention_days, settings.change_prune_batch_size)
+    finally:
+        db.close()
+
+
+def deliver(message):
+    try:
+        with mailer.pool.connection() as smtp_server:
+            mailer.send(smtp_server, message.recipient, message.subject, message.body)
+    except (smtplib.SMTPException, OSError) as error:
+        return error
+
+
+# Sends one batch of due outbox messages spread over the pooled SMTP sessions, returns how many were claimed
+def send_outbox_batch():
+    db = SessionLocal()
+    try:
+        messages = outbox_crud.claim_due_messages(db, settings.outbox_batch_size)
+        if messages:
+            with ThreadPoolExecutor(max_workers=settings.smtp_pool_size) as executor:
+                errors = list(executor.map(deliver, messages))
+            for message, error in zip(messages, errors):
+                if error is None:
+                    outbox_crud.mark_sent(db, message)
+                else:
+                    logger.warning("sending outbox message %s failed: %r", message.id, error)
+                    outbox_crud.mark_failed(db, message, repr(error), settings.outbox_max_attempts, settings.outbox_retry_base, settings.outbox_retry_max)
+            db.commit()
+        return len(messages)
+    finally:
+        db.close()
+
+
+def drain_outbox():
+    while send_outbox_batch() == settings.outbox_batch_size:
+        pass
+
+
+def start():
+    tasks.append(asyncio.create_task(run_periodically(settings.rank_rebalance_interval, rebalance_ranks)))
+    tasks.append(asyncio.create_task(run_periodically(settings.outbox_poll_interval, drain_outbox)))
+    tasks.append(asyncio.create_task(run_periodically(settings.change_prune_interval, prune_changes)))
+
+
+async def stop():
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    tasks.clear()
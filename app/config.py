@@ -12,6 +12,60 @@ class Settings(BaseSettings):
     access_token_expire_minutes: int
     sender_email: str
     sender_password: str
+    smtp_host: str = "smtp.gmail.com"
+    smtp_port: int = 587
+    smtp_starttls: bool = True
+    smtp_login: bool = True
+    smtp_timeout: float = 30
+    smtp_pool_size: int = 4
+    smtp_pool_check_interval: float = 30
+    smtp_pool_max_idle: float = 300
+    outbox_poll_interval: float = 5
+    realtime_queue_size: int = 256
+    realtime_keepalive_interval: float = 30
+    realtime_reconnect_delay: float = 2
+    outbox_batch_size: int = 50
+    outbox_max_attempts: int = 8
+    outbox_retry_base: float = 30
+    outbox_retry_max: float = 3600
+    # asyncpg for the coroutine routes, only users and auth so far. Board, list, card, comment and member routes
+    # stay sync on the threadpool: their permission dependencies, the COPY import and the export use the sync engine.
+    database_async: bool = False
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = -1
+    db_pool_pre_ping: bool = False
+    threadpool_limit: int = 40
+    metrics_token: str | None = None
+    query_budget_enforce: bool = False
+    query_analysis: bool = False
+    n_plus_one_threshold: int = 5
+    slow_query_threshold: float = 0
+    slow_query_explain: bool = False
+    rank_max_length: int = 24
+    rank_rebalance_interval: int = 300
+    bulk_create_max_items: int = 1000
+    export_yield_per: int = 1000
+    change_retention_days: int = 30
+    response_cache_backend: str = "memory"
+    response_cache_max_bytes: int = 64 * 1024 * 1024
+    response_cache_ttl: float = 300
+    response_cache_redis_host: str = "localhost"
+    response_cache_redis_port: int = 6379
+    response_cache_redis_timeout: float = 0.5
+    response_cache_redis_retry_interval: float = 5
+    change_prune_interval: float = 3600
+    change_prune_batch_size: int = 10000
+    permission_cache_size: int = 10000
+    permission_cache_ttl: int = 300
+    principal_cache_size: int = 10000
+    principal_cache_ttl: int = 60
+    auth_claims_only: bool = False
+    password_hash_rounds: int = 12
+    password_hash_executor: str = "thread"
+    password_hash_workers: int = 4
+    password_hash_queue_depth: int = 64
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,35 @@
+import functools
+import inspect
+import types
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from . import users_crud as _users_crud, boards_crud as _boards_crud, lists_crud as _lists_crud, cards_crud as _cards_crud, \
+    comments_crud as _comments_crud, board_members_crud as _board_members_crud
+
+
+# Awaitable versions of the crud functions. With an AsyncSession the function runs through run_sync on asyncpg,
+# with a sync Session it runs in the threadpool, so coroutine routes never block the event loop on the database.
+# Only the users and auth routers are coroutines so far, the other routers call the sync crud modules directly.
+def to_async(func):
+    @functools.wraps(func)
+    async def wrapper(db, *args, **kwargs):
+        if isinstance(db, AsyncSession):
+            return await db.run_sync(func, *args, **kwargs)
+        return await run_in_threadpool(func, db, *args, **kwargs)
+    return wrapper
+
+
+def async_module(module):
+    functions = {name: to_async(value) for name, value in vars(module).items() 
+                 if inspect.isfunction(value) and value.__module__ == module.__name__ and not name.startswith("_")}
+    return types.SimpleNamespace(**functions)
+
+
+users_crud = async_module(_users_crud)
+boards_crud = async_module(_boards_crud)
+lists_crud = async_module(_lists_crud)
+cards_crud = async_module(_cards_crud)
+comments_crud = async_module(_comments_crud)
+board_members_crud = async_module(_board_members_crud)
@@ -1,7 +1,8 @@
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 
-from .. import schemas, utils, models
+from .. import schemas, utils, models, mailer, events
+from . import users_crud, outbox_crud
 
 
 def get_board_members(db: Session, board_id: int):
@@ -14,19 +15,51 @@ def get_board_member(db: Session, board_id: int, user_id: int):
     return board_member
 
 
+def get_board_member_ids(db: Session, board_id: int, user_ids: list[int]):
+    return {user_id for (user_id,) in db.query(models.BoardMember.user_id).filter(models.BoardMember.board_id == board_id, models.BoardMember.user_id.in_(user_ids)).all()}
+
+
 def add_board_member(db: Session, board_id: int, user_id: int):
     board_member = models.BoardMember(board_id=board_id, user_id=user_id)
 
     db.add(board_member)
+    events.publish(db, board_id, "member.added", {"user_id": user_id})
     db.commit()
     db.refresh(board_member)
+    users_crud.invalidate_board_role(user_id, board_id)
+
+
+# The membership and its invitation email are committed together, the outbox worker delivers the email later
+def invite_board_member(db: Session, board_id: int, user_id: int, email: str):
+    db.add(models.BoardMember(board_id=board_id, user_id=user_id))
+    subject, html = mailer.invitation(board_id)
+    outbox_crud.add_message(db, email, subject, html)
+    events.publish(db, board_id, "member.added", {"user_id": user_id})
+    db.commit()
+    users_crud.invalidate_board_role(user_id, board_id)
+
+
+def invite_board_members(db: Session, board_id: int, users: list[models.User]):
+    subject, html = mailer.invitation(board_id)
+    user_ids = [user.id for user in users]
+    for user in users:
+        db.add(models.BoardMember(board_id=board_id, user_id=user.id))
+        outbox_crud.add_message(db, user.email, subject, html)
+    events.publish(db, board_id, "members.added", {"user_ids": user_ids})
+    db.commit()
+    for user_id in user_ids:
+        users_crud.invalidate_board_role(user_id, board_id)
 
 
 def update_board_member(db: Session, board_id: int, user_id: int, updated_member: schemas.BoardMemberUpdate):
     db.query(models.BoardMember).filter(models.BoardMember.board_id == board_id, models.BoardMember.user_id == user_id).update({"role": updated_member.role}, synchronize_session=False)
+    events.publish(db, board_id, "member.updated", {"user_id": user_id, "role": updated_member.role})
     db.commit()
+    users_crud.invalidate_board_role(user_id, board_id)
 
 
 def remove_board_member(db: Session, board_id: int, user_id: int):
     db.query(models.BoardMember).filter(models.BoardMember.board_id == board_id, models.BoardMember.user_id == user_id).delete(synchronize_session=False)
-    db.commit()
\ No newline at end of file
+    events.publish(db, board_id, "member.removed", {"user_id": user_id})
+    db.commit()
+    users_crud.invalidate_board_role(user_id, board_id)
\ No newline at end of file
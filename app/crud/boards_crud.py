@@ -1,7 +1,12 @@
-from sqlalchemy.orm import Session
+from collections import defaultdict
+from typing import NamedTuple
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import Session, joinedload, selectinload
 from fastapi import HTTPException, status
 
-from .. import schemas, utils, models
+from .. import schemas, utils, models, pagination
+from . import users_crud
 
 
 def create_board(db: Session, board: schemas.BoardCreate, owner_id: int):
@@ -14,9 +19,12 @@ def create_board(db: Session, board: schemas.BoardCreate, owner_id: int):
     return new_board
 
 
-def get_boards_by_owner_id(db: Session, owner_id: int, name: str = ""):
-    boards = db.query(models.Board).filter(models.Board.owner_id == owner_id, models.Board.name.contains(name)).all()
-    return boards
+def get_boards_by_owner_id(db: Session, owner_id: int, name: str = "", limit: int = pagination.DEFAULT_LIMIT, after: str | None = None):
+    query = db.query(models.Board).options(joinedload(models.Board.owner), selectinload(models.Board.lists)).filter(models.Board.owner_id == owner_id)
+    if name:
+        # served by the pg_trgm index on boards.name
+        query = query.filter(models.Board.name.contains(name))
+    return pagination.paginate(query, [models.Board.id], limit, after)
 
 
 def get_board_by_id(db: Session, id: int):
@@ -30,3 +38,87 @@ def validate_board_presence(db: Session, board_id: int):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="board not found")
     return board
 
+
+class BoardPath(NamedTuple):
+    board: models.Board
+    list: models.List | None
+    card: models.Card | None
+    role: str | None
+
+
+def get_board_path(db: Session, board_id: int, user_id: int, list_id: int | None = None, card_id: int | None = None):
+    query = db.query(models.Board, models.BoardMember.role).outerjoin(models.BoardMember, and_(models.BoardMember.board_id == models.Board.id, 
+                                                                                                  models.BoardMember.user_id == user_id))
+    if list_id is not None:
+        query = query.add_entity(models.List).outerjoin(models.List, and_(models.List.board_id == models.Board.id, models.List.id == list_id))
+    if card_id is not None:
+        query = query.add_entity(models.Card).outerjoin(models.Card, and_(models.Card.list_id == models.List.id, models.Card.id == card_id))
+
+    row = query.filter(models.Board.id == board_id).first()
+    if not row:
+        return None
+    return BoardPath(row[0], row[2] if list_id is not None else None, row[3] if card_id is not None else None, row[1])
+
+
+def validate_board_path(db: Session, board_id: int, user_id: int, roles: list[str], list_id: int | None = None, card_id: int | None = None):
+    path = get_board_path(db, board_id, user_id, list_id, card_id)
+    if not path:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="board not found")
+    users_crud.board_roles.set((user_id, board_id), users_crud.OWNER if path.board.owner_id == user_id else path.role)
+    if path.board.owner_id != user_id and path.role not in roles:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="permission denied")
+    if list_id is not None and not path.list:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="list not found")
+    if card_id is not None and not path.card:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="card not found")
+    return path
+
+
+# Whole board in a fixed number of queries: lists, cards, card members, comment counts.
+# Built as plain dicts in BoardSnapshot's shape from row tuples, no ORM objects or models per card.
+def get_board_snapshot(db: Session, board: models.Board):
+    board_list_ids = select(models.List.id).where(models.List.board_id == board.id)
+    board_card_ids = select(models.Card.id).where(models.Card.list_id.in_(board_list_ids))
+
+    lists = db.query(models.List.id, models.List.name, models.List.position, models.List.rank, models.List.board_id, models.List.created_at).filter(models.List.board_id == board.id).order_by(models.List.rank).all()
+    cards = db.query(models.Card.id, models.Card.title, models.Card.description, models.Card.position, models.Card.rank, models.Card.due_date, 
+                     models.Card.list_id, models.Card.created_at).filter(models.Card.list_id.in_(board_list_ids)).order_by(models.Card.rank).all()
+    member_rows = db.query(models.CardMembers.card_id, models.User.id, models.User.username, models.User.email, models.User.created_at).join(models.User, 
+                                                                                                                                            models.User.id == models.CardMembers.user_id).filter(models.CardMembers.card_id.in_(board_card_ids)).all()
+    comment_counts = dict(db.query(models.Comment.card_id, func.count(models.Comment.id)).filter(models.Comment.card_id.in_(board_card_ids)).group_by(models.Comment.card_id).all())
+
+    members = defaultdict(list)
+    for row in member_rows:
+        members[row.card_id].append({"id": row.id, "username": row.username, "email": row.email, "created_at": row.created_at})
+
+    cards_by_list = defaultdict(list)
+    for card in cards:
+        cards_by_list[card.list_id].append({**card._asdict(), "members": members[card.id], "comment_count": comment_counts.get(card.id, 0)})
+
+    owner = board.owner
+    return {"id": board.id, 
+            "name": board.name, 
+            "owner_id": board.owner_id, 
+            "created_at": board.created_at, 
+            "owner": {"id": owner.id, "username": owner.username, "email": owner.email, "created_at": owner.created_at}, 
+            "lists": [{**list._asdict(), "cards": cards_by_list[list.id]} for list in lists]}
+
+
+# (record type, row) pairs for a whole board, every query is read through a server-side cursor in batches of yield_per rows
+def stream_board_export(db: Session, board_id: int, yield_per: int):
+    board_list_ids = select(models.List.id).where(models.List.board_id == board_id)
+    board_card_ids = select(models.Card.id).where(models.Card.list_id.in_(board_list_ids))
+
+    queries = [
+        ("board", select(models.Board.id, models.Board.name, models.Board.owner_id, models.Board.created_at).where(models.Board.id == board_id)),
+        ("board_member", select(models.BoardMember.board_id, models.BoardMember.user_id, models.BoardMember.role).where(models.BoardMember.board_id == board_id)),
+        ("list", select(models.List.id, models.List.board_id, models.List.name, models.List.position, models.List.rank, models.List.created_at).where(models.List.board_id == board_id).order_by(models.List.rank)),
+        ("card", select(models.Card.id, models.Card.list_id, models.Card.title, models.Card.description, models.Card.position, models.Card.rank, models.Card.due_date, 
+                        models.Card.created_at).where(models.Card.list_id.in_(board_list_ids)).order_by(models.Card.list_id, models.Card.rank)),
+        ("card_member", select(models.CardMembers.card_id, models.CardMembers.user_id).where(models.CardMembers.card_id.in_(board_card_ids))),
+        ("comment", select(models.Comment.id, models.Comment.card_id, models.Comment.user_id, models.Comment.comment_text, models.Comment.created_at, 
+                           models.Comment.updated_at).where(models.Comment.card_id.in_(board_card_ids)).order_by(models.Comment.card_id, models.Comment.created_at, models.Comment.id)),
+    ]
+    for record_type, query in queries:
+        for row in db.execute(query.execution_options(yield_per=yield_per)).mappings():
+            yield record_type, row
@@ -1,22 +1,75 @@
+from sqlalchemy import cast, func, or_, select, insert, update, values, column, text, Integer, String, Float
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 
-from .. import schemas, utils, models
+from .. import schemas, utils, models, pagination, ranking, events
 
 
-def create_card(db: Session, card: schemas.CardCreate, list_id: int):
-    new_card = models.Card(**card.dict(), list_id=list_id)
+def get_last_rank(db: Session, list_id: int):
+    return db.query(func.max(models.Card.rank)).filter(models.Card.list_id == list_id).scalar()
 
-    db.add(new_card)
-    db.commit()
+
+# Appends to a list are serialized on its row, so concurrent ones don't read the same last rank or both pass the
+# position check. NO KEY UPDATE doesn't block the KEY SHARE locks taken by foreign key checks on cards.
+# Positions are no longer unique in the database (moves keep them), the check only holds for appends.
+def lock_list(db: Session, list_id: int):
+    db.query(models.List.id).filter(models.List.id == list_id).with_for_update(key_share=True).scalar()
+
+
+def create_card(db: Session, card: schemas.CardCreate, list_id: int, board_id: int):
+    lock_list(db, list_id)
+    if get_card_by_position_and_list_id(db, card.position, list_id):
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="card with this position already exists")
+    new_card = models.Card(**card.dict(), list_id=list_id, rank=ranking.between(get_last_rank(db, list_id), None))
+
+    try:
+        db.add(new_card)
+        db.flush()
+        events.publish(db, board_id, "card.created", {**card.dict(), "id": new_card.id, "list_id": list_id, "rank": new_card.rank})
+        db.commit()
+    except IntegrityError:
+        # a concurrent move to the end of the list took the rank
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="list was changed concurrently, retry")
     db.refresh(new_card)
 
     return new_card
 
 
-def get_cards(db: Session, list_id: int):
-    cards = db.query(models.Card).filter(models.Card.list_id == list_id).all()
-    return cards
+# Positions are checked against each other in memory and against the list in one query
+def validate_new_positions(db: Session, list_id: int, positions: list[int]):
+    if len(set(positions)) != len(positions):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="duplicate positions in request")
+    taken = db.query(models.Card.position).filter(models.Card.list_id == list_id, models.Card.position.in_(positions)).order_by(models.Card.position).all()
+    if taken:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"cards with positions {[position for (position,) in taken]} already exist")
+
+
+# Same locking as create_card, positions are validated behind the lock
+def create_cards(db: Session, cards: list[schemas.CardCreate], list_id: int, board_id: int):
+    lock_list(db, list_id)
+    validate_new_positions(db, list_id, [card.position for card in cards])
+    ranks = ranking.keys_after(get_last_rank(db, list_id), len(cards))
+    rows = [{**card.dict(), "list_id": list_id, "rank": rank} for card, rank in zip(cards, ranks)]
+    try:
+        new_cards = db.execute(insert(models.Card).returning(models.Card.id, models.Card.title, models.Card.description, models.Card.position, models.Card.rank, models.Card.due_date, models.Card.list_id, models.Card.created_at, sort_by_parameter_order=True), rows).all()
+        events.publish(db, board_id, "cards.created", {"list_id": list_id, "cards": [card._asdict() for card in new_cards]})
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="list was changed concurrently, retry")
+
+    return new_cards
+
+
+# Plain dicts in CardOut's shape, no ORM objects are built
+def get_cards(db: Session, list_id: int, limit: int = pagination.DEFAULT_LIMIT, after: str | None = None):
+    query = db.query(models.Card.id, models.Card.title, models.Card.description, models.Card.position, models.Card.rank, models.Card.due_date, 
+                     models.Card.list_id, models.Card.created_at).filter(models.Card.list_id == list_id)
+    rows, next_cursor = pagination.paginate(query, [models.Card.rank], limit, after)
+    return [row._asdict() for row in rows], next_cursor
 
 
 def get_card(db: Session, list_id: int, id: int):
@@ -48,16 +101,159 @@ def get_card_memeber_by_id(db: Session, card_id: int, member_id: int):
     return member
 
 
-def add_card_member(db: Session, card_id: int, user_id: int):
+def add_card_member(db: Session, card_id: int, user_id: int, board_id: int):
     new_member = models.CardMembers(user_id=user_id, card_id=card_id)
 
     db.add(new_member)
+    events.publish(db, board_id, "card_member.added", {"card_id": card_id, "user_id": user_id})
     db.commit()
     db.refresh(new_member)
 
     return new_member
 
 
-def remove_card_member(db: Session, card_id: int, member_id: int):
+def remove_card_member(db: Session, card_id: int, member_id: int, board_id: int):
     db.query(models.CardMembers).filter(models.CardMembers.card_id == card_id, models.CardMembers.user_id == member_id).delete(synchronize_session=False)
-    db.commit()
\ No newline at end of file
+    events.publish(db, board_id, "card_member.removed", {"card_id": card_id, "user_id": member_id})
+    db.commit()
+
+
+# Cards of a board matching q in their title/description or in one of their comments, best match first
+def search_cards(db: Session, board_id: int, q: str, limit: int = pagination.DEFAULT_LIMIT, after: str | None = None):
+    ts_query = func.websearch_to_tsquery("english", q)
+    board_card_ids = select(models.Card.id).join(models.List, models.List.id == models.Card.list_id).where(models.List.board_id == board_id)
+    comment_scores = select(models.Comment.card_id, func.max(func.ts_rank(models.Comment.search_vector, ts_query)).label("score")).where(models.Comment.search_vector.bool_op("@@")(ts_query), 
+                                                                                                                                       models.Comment.card_id.in_(board_card_ids)).group_by(models.Comment.card_id).subquery()
+    # ts_rank is a real, as double precision the score round-trips through the cursor and ties stay on the next page
+    score = cast(func.greatest(func.ts_rank(models.Card.search_vector, ts_query), func.coalesce(comment_scores.c.score, 0)), Float)
+
+    query = db.query(models.Card, score.label("score")).join(models.List, 
+                                                             models.List.id == models.Card.list_id).outerjoin(comment_scores, 
+                                                                                                              comment_scores.c.card_id == models.Card.id).filter(models.List.board_id == board_id, 
+                                                                                                                                                                 or_(models.Card.search_vector.bool_op("@@")(ts_query), comment_scores.c.card_id.isnot(None)))
+    return pagination.paginate(query, [-score, models.Card.id], limit, after, cursor_values=lambda row: [-row.score, row.Card.id])
+
+
+def get_card_rank(db: Session, list_id: int, card_id: int):
+    rank = db.query(models.Card.rank).filter(models.Card.list_id == list_id, models.Card.id == card_id).scalar()
+    if rank is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="card not found")
+    return rank
+
+
+# Ranks of the cards a card will sit between in list_id, a missing neighbour is looked up from the other one
+def get_neighbour_ranks(db: Session, list_id: int, card_id: int, after_card_id: int | None = None, before_card_id: int | None = None):
+    after_rank = get_card_rank(db, list_id, after_card_id) if after_card_id is not None else None
+    before_rank = get_card_rank(db, list_id, before_card_id) if before_card_id is not None else None
+
+    siblings = db.query(models.Card.rank).filter(models.Card.list_id == list_id, models.Card.id != card_id)
+    if after_card_id is not None and before_card_id is None:
+        before_rank = siblings.filter(models.Card.rank > after_rank).order_by(models.Card.rank).limit(1).scalar()
+    elif before_card_id is not None and after_card_id is None:
+        after_rank = siblings.filter(models.Card.rank < before_rank).order_by(models.Card.rank.desc()).limit(1).scalar()
+    elif after_card_id is None and before_card_id is None:
+        after_rank = siblings.order_by(models.Card.rank.desc()).limit(1).scalar()
+
+    if after_rank is not None and before_rank is not None and after_rank >= before_rank:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="after_card_id must come before before_card_id")
+    return after_rank, before_rank
+
+
+def move_card(db: Session, card: models.Card, list_id: int, rank: str, board_id: int):
+    try:
+        db.query(models.Card).filter(models.Card.id == card.id).update({"list_id": list_id, "rank": rank}, synchronize_session=False)
+        events.publish(db, board_id, "card.moved", {"id": card.id, "from_list_id": card.list_id, "list_id": list_id, "rank": rank})
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="card was moved concurrently, retry")
+    db.refresh(card)
+
+    return card
+
+
+# Rewrites ranks by card id with a single UPDATE ... FROM (VALUES ...)
+def update_ranks(db: Session, ranks: dict[int, str]):
+    if not ranks:
+        return
+    new_ranks = values(column("id", Integer), column("rank", String), name="new_ranks").data(list(ranks.items()))
+    db.execute(text("SET CONSTRAINTS uq_cards_list_id_rank DEFERRED"))
+    db.execute(update(models.Card).where(models.Card.id == new_ranks.c.id).values(rank=new_ranks.c.rank).execution_options(synchronize_session=False))
+
+
+# Moves cards by id with a single UPDATE ... FROM (VALUES (id, list_id, rank), ...)
+def update_list_ids_and_ranks(db: Session, moves: list[tuple[int, int, str]]):
+    new_ranks = values(column("id", Integer), column("list_id", Integer), column("rank", String), name="new_ranks").data(moves)
+    db.execute(text("SET CONSTRAINTS uq_cards_list_id_rank DEFERRED"))
+    db.execute(update(models.Card).where(models.Card.id == new_ranks.c.id).values(list_id=new_ranks.c.list_id, rank=new_ranks.c.rank).execution_options(synchronize_session=False))
+
+
+# Operations are applied in order, position is the card's index in the target list at that point.
+# Only moved cards get new ranks: each run of moved cards is spread between its unmoved neighbours.
+def bulk_move_cards(db: Session, board_id: int, operations: list[schemas.CardMoveOperation]):
+    card_ids = [operation.card_id for operation in operations]
+    moved = set(card_ids)
+    if len(moved) != len(card_ids):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="card can be moved only once per request")
+
+    target_list_ids = {operation.list_id for operation in operations}
+    found_list_ids = {list_id for (list_id,) in db.query(models.List.id).filter(models.List.board_id == board_id, models.List.id.in_(target_list_ids)).all()}
+    if found_list_ids != target_list_ids:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="list not found")
+
+    source_list_ids = dict(db.query(models.Card.id, models.Card.list_id).join(models.List).filter(models.List.board_id == board_id, models.Card.id.in_(moved)).all())
+    if len(source_list_ids) != len(moved):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="card not found")
+
+    affected_list_ids = target_list_ids | set(source_list_ids.values())
+    rows = db.query(models.Card.id, models.Card.list_id, models.Card.rank).filter(models.Card.list_id.in_(affected_list_ids)).order_by(models.Card.list_id, models.Card.rank).with_for_update().all()
+    orderings = {list_id: [] for list_id in sorted(affected_list_ids)}
+    ranks = {}
+    for card_id, list_id, rank in rows:
+        orderings[list_id].append(card_id)
+        ranks[card_id] = rank
+    if not moved <= ranks.keys():
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="cards were moved concurrently, retry")
+
+    for list_id, ids in orderings.items():
+        orderings[list_id] = [card_id for card_id in ids if card_id not in moved]
+    for index, operation in enumerate(operations):
+        # list.insert would append silently, the client's view of the list is outdated
+        if operation.position > len(orderings[operation.list_id]):
+            db.rollback()
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail=f"operation {index}: position {operation.position} is past the end of list {operation.list_id} ({len(orderings[operation.list_id])} cards)")
+        orderings[operation.list_id].insert(operation.position, operation.card_id)
+
+    moves = []
+    for list_id, ids in orderings.items():
+        run, before = [], None
+        for card_id in ids + [None]:
+            if card_id in moved:
+                run.append(card_id)
+                continue
+            after = ranks[card_id] if card_id is not None else None
+            moves.extend((run_card_id, list_id, rank) for run_card_id, rank in zip(run, ranking.between_n(before, after, len(run))))
+            run, before = [], after
+
+    try:
+        update_list_ids_and_ranks(db, moves)
+        events.publish(db, board_id, "cards.moved", {"cards": [{"id": card_id, "list_id": list_id, "rank": rank} for card_id, list_id, rank in moves]})
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="cards were moved concurrently, retry")
+
+    return [{"list_id": list_id, "card_ids": ids} for list_id, ids in orderings.items()]
+
+
+def rebalance_ranks(db: Session, max_length: int):
+    parents = db.query(models.Card.list_id, models.List.board_id).join(models.List).filter(func.length(models.Card.rank) > max_length).distinct().all()
+    for list_id, board_id in parents:
+        card_ids = [card_id for (card_id,) in db.query(models.Card.id).filter(models.Card.list_id == list_id).order_by(models.Card.rank).with_for_update().all()]
+        ranks = dict(zip(card_ids, ranking.spread(len(card_ids))))
+        update_ranks(db, ranks)
+        events.publish(db, board_id, "cards.reranked", {"list_id": list_id, "ranks": ranks})
+        db.commit()
+    return len(parents)
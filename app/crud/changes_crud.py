@@ -0,0 +1,99 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, func, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from .. import models
+
+
+def load_cards(db: Session, board_id: int, keys: set[str]):
+    rows = db.execute(select(models.Card.id, models.Card.title, models.Card.description, models.Card.position, models.Card.rank, models.Card.due_date, 
+                             models.Card.list_id, models.Card.created_at).join(models.List)
+                      .where(models.List.board_id == board_id, models.Card.id.in_([int(key) for key in keys]))).mappings()
+    return {str(row["id"]): dict(row) for row in rows}
+
+
+def load_lists(db: Session, board_id: int, keys: set[str]):
+    rows = db.execute(select(models.List.id, models.List.name, models.List.position, models.List.rank, models.List.board_id, models.List.created_at)
+                      .where(models.List.board_id == board_id, models.List.id.in_([int(key) for key in keys]))).mappings()
+    return {str(row["id"]): dict(row) for row in rows}
+
+
+def load_comments(db: Session, board_id: int, keys: set[str]):
+    rows = db.execute(select(models.Comment.id, models.Comment.comment_text, models.Comment.card_id, models.Comment.user_id, models.Comment.created_at, 
+                             models.Comment.updated_at).join(models.Card).join(models.List)
+                      .where(models.List.board_id == board_id, models.Comment.id.in_([int(key) for key in keys]))).mappings()
+    return {str(row["id"]): dict(row) for row in rows}
+
+
+# Card members are keyed "card_id:user_id"
+def load_card_members(db: Session, board_id: int, keys: set[str]):
+    pairs = [tuple(int(part) for part in key.split(":")) for key in keys]
+    rows = db.execute(select(models.CardMembers.card_id, models.CardMembers.user_id).join(models.Card, models.Card.id == models.CardMembers.card_id).join(models.List)
+                      .where(models.List.board_id == board_id, tuple_(models.CardMembers.card_id, models.CardMembers.user_id).in_(pairs))).mappings()
+    return {f"{row['card_id']}:{row['user_id']}": dict(row) for row in rows}
+
+
+def load_members(db: Session, board_id: int, keys: set[str]):
+    rows = db.execute(select(models.BoardMember.user_id, models.BoardMember.board_id, models.BoardMember.role)
+                      .where(models.BoardMember.board_id == board_id, models.BoardMember.user_id.in_([int(key) for key in keys]))).mappings()
+    return {str(row["user_id"]): dict(row) for row in rows}
+
+
+LOADERS = {"card": load_cards, "list": load_lists, "comment": load_comments, "card_member": load_card_members, "member": load_members}
+
+
+# Without since only the current position of the log is returned: clients take it, fetch the snapshot and then
+# follow the feed from there.
+def get_change_cursor(db: Session, board: models.Board):
+    latest = db.execute(select(func.max(models.BoardChange.seq)).where(models.BoardChange.board_id == board.id)).scalar()
+    return {"since": None, "next": latest or board.changes_pruned_through, "has_more": False, "changes": []}
+
+
+# Compacted changes after since: one entry per entity at its latest seq, either an upsert with the entity's current
+# state or a tombstone. Entities that are gone although their last change wasn't a delete (cascades) become tombstones too.
+def get_changes(db: Session, board: models.Board, since: int, limit: int):
+    if since < board.changes_pruned_through:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="changes since this point were pruned, refetch the board")
+
+    change = models.BoardChange
+    latest = (select(change.seq, change.entity, change.entity_id, change.deleted).where(change.board_id == board.id, change.seq > since)
+              .distinct(change.entity, change.entity_id).order_by(change.entity, change.entity_id, change.seq.desc()).subquery())
+    rows = db.execute(select(latest).order_by(latest.c.seq).limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    keys = defaultdict(set)
+    for _, entity, entity_id, deleted in rows:
+        if not deleted:
+            keys[entity].add(entity_id)
+    current = {entity: LOADERS[entity](db, board.id, entity_keys) for entity, entity_keys in keys.items()}
+
+    changes = []
+    for seq, entity, entity_id, deleted in rows:
+        data = None if deleted else current[entity].get(entity_id)
+        changes.append({"seq": seq, "entity": entity, "id": entity_id, "op": "upsert" if data is not None else "delete", "data": data})
+
+    return {"since": since, "next": rows[-1].seq if rows else since, "has_more": has_more, "changes": changes}
+
+
+# Deletes log entries older than the retention in batches of separate transactions, oldest first. Each board remembers
+# the highest seq removed so feeds that would skip pruned entries are refused instead of silently missing changes.
+def prune_changes(db: Session, retention_days: int, batch_size: int):
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    pruned_count = 0
+    while True:
+        expired = select(models.BoardChange.seq).where(models.BoardChange.created_at < cutoff).order_by(models.BoardChange.seq).limit(batch_size).scalar_subquery()
+        pruned = db.execute(delete(models.BoardChange).where(models.BoardChange.seq.in_(expired))
+                            .returning(models.BoardChange.board_id, models.BoardChange.seq).execution_options(synchronize_session=False)).all()
+        pruned_through = {}
+        for board_id, seq in pruned:
+            pruned_through[board_id] = max(seq, pruned_through.get(board_id, 0))
+        if pruned_through:
+            db.execute(update(models.Board), [{"id": board_id, "changes_pruned_through": seq} for board_id, seq in pruned_through.items()])
+        db.commit()
+        pruned_count += len(pruned)
+        if len(pruned) < batch_size:
+            return pruned_count
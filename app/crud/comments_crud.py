@@ -1,28 +1,48 @@
 from datetime import datetime
 
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 
-from .. import schemas, utils, models
+from .. import schemas, utils, models, pagination, events
 
 
 def get_comment_by_id_query(db: Session, comment_id: int):
     return db.query(models.Comment).filter(models.Comment.id == comment_id)
 
 
-def create_comment(db: Session, comment: schemas.CommentCreate, card_id: int, user_id: int):
+def create_comment(db: Session, comment: schemas.CommentCreate, card_id: int, user_id: int, board_id: int):
     new_comment = models.Comment(**comment.dict(), card_id=card_id, user_id=user_id)
 
     db.add(new_comment)
+    db.flush()
+    events.publish(db, board_id, "comment.created", {**comment.dict(), "id": new_comment.id, "card_id": card_id, "user_id": user_id})
     db.commit()
     db.refresh(new_comment)
 
     return new_comment
 
 
-def get_comments(db: Session, card_id: int):
-    comments = db.query(models.Comment).filter(models.Comment.card_id == card_id).all()
-    return comments
+def create_comments(db: Session, comments: list[schemas.CommentCreate], card_id: int, user_id: int, board_id: int):
+    rows = [{**comment.dict(), "card_id": card_id, "user_id": user_id} for comment in comments]
+    new_comments = db.execute(insert(models.Comment).returning(models.Comment.id, models.Comment.comment_text, models.Comment.card_id, models.Comment.created_at, 
+                                                               models.Comment.updated_at, sort_by_parameter_order=True), rows).all()
+    user = db.get(models.User, user_id)
+    events.publish(db, board_id, "comments.created", {"card_id": card_id, "user_id": user_id, "comments": [comment._asdict() for comment in new_comments]})
+    db.commit()
+
+    return [{**comment._mapping, "user": user} for comment in new_comments]
+
+
+# Plain dicts in CommentOut's shape, the author is joined in the same query
+def get_comments(db: Session, card_id: int, limit: int = pagination.DEFAULT_LIMIT, after: str | None = None):
+    query = db.query(models.Comment.id, models.Comment.comment_text, models.Comment.card_id, models.Comment.created_at, models.Comment.updated_at, 
+                     models.User.id.label("user_id"), models.User.username, models.User.email, models.User.created_at.label("user_created_at")).join(models.User, 
+                                                                                                                                                 models.User.id == models.Comment.user_id).filter(models.Comment.card_id == card_id)
+    rows, next_cursor = pagination.paginate(query, [models.Comment.created_at, models.Comment.id], limit, after)
+    comments = [{"id": row.id, "comment_text": row.comment_text, "card_id": row.card_id, "created_at": row.created_at, "updated_at": row.updated_at, 
+                 "user": {"id": row.user_id, "username": row.username, "email": row.email, "created_at": row.user_created_at}} for row in rows]
+    return comments, next_cursor
 
 
 def get_user_comment(db: Session, card_id: int, comment_id: int, user_id: int):
@@ -30,11 +50,14 @@ def get_user_comment(db: Session, card_id: int, comment_id: int, user_id: int):
     return comment
 
 
-def delete_comment(db: Session, comment_id: int):
+def delete_comment(db: Session, comment_id: int, card_id: int, board_id: int):
     get_comment_by_id_query(db, comment_id).delete(synchronize_session=False)
+    events.publish(db, board_id, "comment.deleted", {"id": comment_id, "card_id": card_id})
     db.commit()
 
 
-def update_comment(db: Session, comment: schemas.CommentCreate, comment_id: int):
-    get_comment_by_id_query(db, comment_id).update({"comment_text": comment.comment_text, "updated_at": datetime.now()}, synchronize_session=False)
+def update_comment(db: Session, comment: schemas.CommentCreate, comment_id: int, card_id: int, board_id: int):
+    updated_at = datetime.now()
+    get_comment_by_id_query(db, comment_id).update({"comment_text": comment.comment_text, "updated_at": updated_at}, synchronize_session=False)
+    events.publish(db, board_id, "comment.updated", {"id": comment_id, "card_id": card_id, "comment_text": comment.comment_text, "updated_at": updated_at})
     db.commit()
\ No newline at end of file
@@ -1,22 +1,73 @@
+from sqlalchemy import func, insert, update, values, column, text, Integer, String
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 
-from .. import schemas, utils, models
+from .. import schemas, utils, models, ranking, events
+
+
+def get_last_rank(db: Session, board_id: int):
+    return db.query(func.max(models.List.rank)).filter(models.List.board_id == board_id).scalar()
+
+
+# Appends to a board are serialized on its row, so concurrent ones don't read the same last rank or both pass the
+# position check. NO KEY UPDATE doesn't block the KEY SHARE locks taken by foreign key checks on lists.
+# Positions are no longer unique in the database, the check only holds for appends.
+def lock_board(db: Session, board_id: int):
+    db.query(models.Board.id).filter(models.Board.id == board_id).with_for_update(key_share=True).scalar()
 
 
 def create_list(db: Session, list: schemas.ListCreate, board_id: int):
-    new_list = models.List(**list.dict(), board_id=board_id)
+    lock_board(db, board_id)
+    if get_list_by_position_and_board_id(db, list.position, board_id):
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="list with this position already exists")
+    new_list = models.List(**list.dict(), board_id=board_id, rank=ranking.between(get_last_rank(db, board_id), None))
 
-    db.add(new_list)
-    db.commit()
+    try:
+        db.add(new_list)
+        db.flush()
+        events.publish(db, board_id, "list.created", {**list.dict(), "id": new_list.id, "board_id": board_id, "rank": new_list.rank})
+        db.commit()
+    except IntegrityError:
+        # a concurrent move to the end of the board took the rank
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="board was changed concurrently, retry")
     db.refresh(new_list)
 
     return new_list
 
 
+# Positions are checked against each other in memory and against the board in one query
+def validate_new_positions(db: Session, board_id: int, positions: list[int]):
+    if len(set(positions)) != len(positions):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="duplicate positions in request")
+    taken = db.query(models.List.position).filter(models.List.board_id == board_id, models.List.position.in_(positions)).order_by(models.List.position).all()
+    if taken:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"lists with positions {[position for (position,) in taken]} already exist")
+
+
+# Same locking as create_list, positions are validated behind the lock
+def create_lists(db: Session, lists: list[schemas.ListCreate], board_id: int):
+    lock_board(db, board_id)
+    validate_new_positions(db, board_id, [list.position for list in lists])
+    ranks = ranking.keys_after(get_last_rank(db, board_id), len(lists))
+    rows = [{**list.dict(), "board_id": board_id, "rank": rank} for list, rank in zip(lists, ranks)]
+    try:
+        new_lists = db.execute(insert(models.List).returning(models.List.id, models.List.name, models.List.position, models.List.rank, models.List.board_id, models.List.created_at, sort_by_parameter_order=True), rows).all()
+        events.publish(db, board_id, "lists.created", {"lists": [list._asdict() for list in new_lists]})
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="board was changed concurrently, retry")
+
+    return new_lists
+
+
+# Plain dicts in ListOut's shape, no ORM objects are built
 def get_lists_by_board_id(db: Session, board_id: int):
-    lists = db.query(models.List).filter(models.List.board_id == board_id).all()
-    return lists
+    lists = db.query(models.List.id, models.List.name, models.List.position, models.List.rank, models.List.board_id, models.List.created_at).filter(models.List.board_id == board_id).order_by(models.List.rank).all()
+    return [list._asdict() for list in lists]
 
 
 def get_list(db: Session, board_id: int, id: int):
@@ -33,4 +84,60 @@ def validate_list_presence(db, board_id: int, list_id: int):
     list = get_list(db, board_id, list_id)
     if not list:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="list not found") 
-    return list
\ No newline at end of file
+    return list
+
+
+def get_list_rank(db: Session, board_id: int, list_id: int):
+    rank = db.query(models.List.rank).filter(models.List.board_id == board_id, models.List.id == list_id).scalar()
+    if rank is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="list not found")
+    return rank
+
+
+def get_neighbour_ranks(db: Session, board_id: int, list_id: int, after_list_id: int | None = None, before_list_id: int | None = None):
+    after_rank = get_list_rank(db, board_id, after_list_id) if after_list_id is not None else None
+    before_rank = get_list_rank(db, board_id, before_list_id) if before_list_id is not None else None
+
+    siblings = db.query(models.List.rank).filter(models.List.board_id == board_id, models.List.id != list_id)
+    if after_list_id is not None and before_list_id is None:
+        before_rank = siblings.filter(models.List.rank > after_rank).order_by(models.List.rank).limit(1).scalar()
+    elif before_list_id is not None and after_list_id is None:
+        after_rank = siblings.filter(models.List.rank < before_rank).order_by(models.List.rank.desc()).limit(1).scalar()
+    elif after_list_id is None and before_list_id is None:
+        after_rank = siblings.order_by(models.List.rank.desc()).limit(1).scalar()
+
+    if after_rank is not None and before_rank is not None and after_rank >= before_rank:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="after_list_id must come before before_list_id")
+    return after_rank, before_rank
+
+
+def move_list(db: Session, list: models.List, rank: str):
+    try:
+        db.query(models.List).filter(models.List.id == list.id).update({"rank": rank}, synchronize_session=False)
+        events.publish(db, list.board_id, "list.moved", {"id": list.id, "rank": rank})
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="list was moved concurrently, retry")
+    db.refresh(list)
+
+    return list
+
+
+def update_ranks(db: Session, ranks: dict[int, str]):
+    if not ranks:
+        return
+    new_ranks = values(column("id", Integer), column("rank", String), name="new_ranks").data([*ranks.items()])
+    db.execute(text("SET CONSTRAINTS uq_lists_board_id_rank DEFERRED"))
+    db.execute(update(models.List).where(models.List.id == new_ranks.c.id).values(rank=new_ranks.c.rank).execution_options(synchronize_session=False))
+
+
+def rebalance_ranks(db: Session, max_length: int):
+    board_ids = [board_id for (board_id,) in db.query(models.List.board_id).filter(func.length(models.List.rank) > max_length).distinct().all()]
+    for board_id in board_ids:
+        list_ids = [list_id for (list_id,) in db.query(models.List.id).filter(models.List.board_id == board_id).order_by(models.List.rank).with_for_update().all()]
+        ranks = dict(zip(list_ids, ranking.spread(len(list_ids))))
+        update_ranks(db, ranks)
+        events.publish(db, board_id, "lists.reranked", {"ranks": ranks})
+        db.commit()
+    return len(board_ids)
@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .. import models
+
+
+# Queued in the caller's transaction, the message only exists if the caller commits
+def add_message(db: Session, recipient: str, subject: str, body: str):
+    message = models.OutboxMessage(recipient=recipient, subject=subject, body=body)
+    db.add(message)
+    return message
+
+
+# SKIP LOCKED lets several workers drain the outbox without sending a message twice
+def claim_due_messages(db: Session, limit: int):
+    return db.query(models.OutboxMessage).filter(models.OutboxMessage.sent_at.is_(None), 
+                                                 models.OutboxMessage.next_attempt_at <= func.now()).order_by(models.OutboxMessage.next_attempt_at).limit(limit).with_for_update(skip_locked=True).all()
+
+
+def mark_sent(db: Session, message: models.OutboxMessage):
+    message.sent_at = datetime.now(timezone.utc)
+    message.attempts += 1
+    message.last_error = None
+
+
+# Exponential backoff, after max_attempts the message is abandoned with next_attempt_at set to NULL
+def mark_failed(db: Session, message: models.OutboxMessage, error: str, max_attempts: int, retry_base: float, retry_max: float):
+    message.attempts += 1
+    message.last_error = error[:1000]
+    if message.attempts >= max_attempts:
+        message.next_attempt_at = None
+    else:
+        message.next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=min(retry_max, retry_base * 2 ** (message.attempts - 1)))
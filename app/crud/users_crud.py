@@ -2,7 +2,15 @@
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 
-from .. import schemas, utils, models
+from .. import schemas, utils, models, cache, pagination
+from ..config import settings
+
+
+OWNER = "owner"
+
+# (user_id, board_id) -> effective role, None for users without access
+board_roles = cache.LRUCache(settings.permission_cache_size, settings.permission_cache_ttl)
+board_role_invalidation_hooks = []
 
 
 def get_user_by_username(db: Session, username: str):
@@ -15,18 +23,21 @@ def get_user_by_email(db: Session, email: str):
     return user
 
 
+def get_users_by_emails(db: Session, emails: list[str]):
+    users = db.query(models.User).filter(models.User.email.in_(emails)).all()
+    return users
+
+
 def get_user_by_id(db: Session, id: int):
     user = db.query(models.User).filter(models.User.id == id).first()
     return user
 
 
-def get_users(db: Session):
-    users = db.query(models.User).all()
-    return users
+def get_users(db: Session, limit: int, after: str | None = None):
+    return pagination.paginate(db.query(models.User), [models.User.id], limit, after)
 
 
 def create_user(db: Session, user: schemas.UserCreate):
-    user.password = utils.hash(user.password)
     new_user = models.User(**user.dict())
 
     db.add(new_user)
@@ -36,13 +47,40 @@ def create_user(db: Session, user: schemas.UserCreate):
     return new_user
 
 
+def update_user_password(db: Session, user: models.User, hashed_password: str):
+    user.password = hashed_password
+    db.commit()
+
+
 def get_board_member(db: Session, user_id: int, board_id):
     user = db.query(models.BoardMember).filter(models.BoardMember.user_id == user_id, models.BoardMember.board_id == board_id).first()
     return user
 
 
+def add_board_role_invalidation_hook(hook):
+    board_role_invalidation_hooks.append(hook)
+
+
+def invalidate_board_role(user_id: int, board_id: int, broadcast: bool = True):
+    board_roles.delete((user_id, board_id))
+    if broadcast:
+        for hook in board_role_invalidation_hooks:
+            hook(user_id, board_id)
+
+
+def get_board_role(db: Session, board, user_id: int):
+    role = board_roles.get((user_id, board.id))
+    if role is cache.MISSING:
+        if board.owner_id == user_id:
+            role = OWNER
+        else:
+            board_member = get_board_member(db, user_id, board.id)
+            role = board_member.role if board_member else None
+        board_roles.set((user_id, board.id), role)
+    return role
+
+
 def check_board_permissions(db, board, user_id, roles: list[str]):
-    if board.owner_id != user_id:
-        board_member = get_board_member(db, user_id, board.id)
-        if not board_member or board_member.role not in roles:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="permission denied")
+    role = get_board_role(db, board, user_id)
+    if role != OWNER and role not in roles:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="permission denied")
@@ -1,21 +1,88 @@
+import time
+
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from starlette.concurrency import run_in_threadpool
 
 from .config import settings
+from . import metrics, instrumentation
 
 SQLALCHEMY_DATABASE_URL = f'postgresql://{settings.database_username}:{settings.database_password}@{settings.database_hostname}:{settings.database_port}/{settings.database_name}'
+ASYNC_SQLALCHEMY_DATABASE_URL = f'postgresql+asyncpg://{settings.database_username}:{settings.database_password}@{settings.database_hostname}:{settings.database_port}/{settings.database_name}'
+
+
+
+# Pools recording how long each checkout waited for a free connection, in total and for the current request
+class TimedQueuePool(QueuePool):
+    checkout_wait = metrics.pool_checkout_wait.labels("sync")
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            self.checkout_wait.observe(waited)
+            instrumentation.add_pool_wait(waited)
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    checkout_wait = metrics.pool_checkout_wait.labels("async")
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            self.checkout_wait.observe(waited)
+            instrumentation.add_pool_wait(waited)
+
+
+pool_options = dict(pool_size=settings.db_pool_size, 
+                    max_overflow=settings.db_max_overflow, 
+                    pool_timeout=settings.db_pool_timeout, 
+                    pool_recycle=settings.db_pool_recycle, 
+                    pool_pre_ping=settings.db_pool_pre_ping)
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, poolclass=TimedQueuePool, **pool_options)
+async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, poolclass=TimedAsyncQueuePool, **pool_options)
+instrumentation.instrument_engine(engine)
+instrumentation.instrument_engine(async_engine.sync_engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=async_engine)
 
 Base = declarative_base()
 
+def pool_status(pool):
+    return {"size": pool.size(), 
+            "checked_in": pool.checkedin(), 
+            "checked_out": pool.checkedout(), 
+            "overflow": pool.overflow(), 
+            "checkout_wait_seconds": pool.checkout_wait.snapshot()}
+
+
 # Dependency
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# Dependency for coroutine routes, database_async switches between asyncpg and the sync engine
+async def get_session():
+    if settings.database_async:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            await run_in_threadpool(db.close)
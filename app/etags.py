@@ -0,0 +1,26 @@
+import hashlib
+
+from fastapi import HTTPException, Request, Response, status
+
+from . import models
+
+
+# Weak validator for board-scoped reads: changes with the board's revision and differs per URL (path and query)
+def board_etag(request: Request, board: models.Board):
+    digest = hashlib.blake2s(f"{request.url.path}?{request.url.query}".encode(), digest_size=8).hexdigest()
+    return f'W/"{board.id}.{board.revision}.{digest}"'
+
+
+def matches(if_none_match: str, etag: str):
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+# The board comes from the access check, so answering 304 costs no query beyond it
+def check_not_modified(request: Request, response: Response, board: models.Board):
+    etag = board_etag(request, board)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and matches(if_none_match, etag):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
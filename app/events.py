@@ -0,0 +1,61 @@
+import json
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+
+
+CHANNEL = "board_events"
+# Session.info key collecting the boards written in the current transaction, see response_cache
+CHANGED_BOARDS = "changed_boards"
+# NOTIFY payloads are limited to 8000 bytes
+MAX_PAYLOAD_SIZE = 7900
+
+
+# Ids of the entities each event type touches, recorded in the board's change log. Entities without a single
+# id are keyed by their composite primary key.
+CHANGED_ENTITIES = {
+    "card.created": lambda data: [("card", data["id"])],
+    "cards.created": lambda data: [("card", card["id"]) for card in data["cards"]],
+    "card.moved": lambda data: [("card", data["id"])],
+    "cards.moved": lambda data: [("card", card["id"]) for card in data["cards"]],
+    "cards.reranked": lambda data: [("card", card_id) for card_id in data["ranks"]],
+    "card_member.added": lambda data: [("card_member", f"{data['card_id']}:{data['user_id']}")],
+    "card_member.removed": lambda data: [("card_member", f"{data['card_id']}:{data['user_id']}")],
+    "comment.created": lambda data: [("comment", data["id"])],
+    "comments.created": lambda data: [("comment", comment["id"]) for comment in data["comments"]],
+    "comment.updated": lambda data: [("comment", data["id"])],
+    "comment.deleted": lambda data: [("comment", data["id"])],
+    "list.created": lambda data: [("list", data["id"])],
+    "lists.created": lambda data: [("list", list["id"]) for list in data["lists"]],
+    "list.moved": lambda data: [("list", data["id"])],
+    "lists.reranked": lambda data: [("list", list_id) for list_id in data["ranks"]],
+    "member.added": lambda data: [("member", data["user_id"])],
+    "members.added": lambda data: [("member", user_id) for user_id in data["user_ids"]],
+    "member.updated": lambda data: [("member", data["user_id"])],
+    "member.removed": lambda data: [("member", data["user_id"])],
+}
+
+
+def encode_value(value):
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+# Bumps the board's revision, appends to its change log and sends the event with pg_notify, all in the caller's
+# transaction: every worker receives it once the transaction commits, nobody does if it rolls back. Events too large
+# for NOTIFY lose their data and only tell clients to refetch.
+# The revision update locks the board row first, so change log sequence numbers of a board follow commit order.
+def publish(db: Session, board_id: int, type: str, data: dict):
+    revision = db.execute(update(models.Board).where(models.Board.id == board_id).values(revision=models.Board.revision + 1).returning(models.Board.revision)
+                          .execution_options(synchronize_session=False)).scalar()
+    db.info.setdefault(CHANGED_BOARDS, set()).add(board_id)
+    deleted = type.endswith((".deleted", ".removed"))
+    changes = [{"board_id": board_id, "revision": revision, "entity": entity, "entity_id": str(entity_id), "deleted": deleted} for entity, entity_id in CHANGED_ENTITIES[type](data)]
+    if changes:
+        db.execute(insert(models.BoardChange), changes)
+    payload = json.dumps({"board_id": board_id, "revision": revision, "type": type, "data": data}, default=encode_value, separators=(",", ":"))
+    if len(payload.encode()) > MAX_PAYLOAD_SIZE:
+        payload = json.dumps({"board_id": board_id, "revision": revision, "type": type, "data": None, "truncated": True}, separators=(",", ":"))
+    db.execute(select(func.pg_notify(CHANNEL, payload)))
+    return revision
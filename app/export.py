@@ -0,0 +1,70 @@
+import csv
+import io
+import json
+from datetime import datetime
+from enum import Enum
+
+from .config import settings
+from .database import SessionLocal
+from .crud import boards_crud
+
+
+CHUNK_SIZE = 64 * 1024
+CSV_FIELDS = ["type", "id", "board_id", "list_id", "card_id", "user_id", "owner_id", "name", "title", "description", "comment_text", "role", 
+              "position", "rank", "due_date", "created_at", "updated_at"]
+
+
+class Format(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+def encode_value(value):
+    return value.isoformat()
+
+
+def ndjson_lines(records):
+    for record_type, row in records:
+        yield json.dumps({"type": record_type, **row}, default=encode_value) + "\n"
+
+
+def csv_lines(records):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, CSV_FIELDS)
+    writer.writeheader()
+    for record_type, row in records:
+        # same ISO timestamps as the NDJSON export, str() would write them with a space
+        writer.writerow({"type": record_type, **{key: encode_value(value) if isinstance(value, datetime) else value for key, value in row.items()}})
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+ENCODERS = {Format.NDJSON: ndjson_lines, Format.CSV: csv_lines}
+MEDIA_TYPES = {Format.NDJSON: "application/x-ndjson", Format.CSV: "text/csv"}
+
+
+# Groups lines into chunks so the response isn't sent one row per write
+def chunked(lines):
+    chunk, size = [], 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield "".join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield "".join(chunk)
+
+
+# Runs with its own session: the response is streamed after the request's dependencies are done with theirs.
+# StreamingResponse pulls the next chunk only once the previous one was sent, so a slow client pauses the cursor.
+# One read-only REPEATABLE READ transaction gives all queries the same snapshot, rows created meanwhile can't
+# show up without their parents.
+def export_board(board_id: int, format: Format):
+    db = SessionLocal()
+    try:
+        db.connection(execution_options={"isolation_level": "REPEATABLE READ", "postgresql_readonly": True})
+        yield from chunked(ENCODERS[format](boards_crud.stream_board_export(db, board_id, settings.export_yield_per)))
+    finally:
+        db.close()
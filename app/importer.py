@@ -0,0 +1,245 @@
+"""Board import.
+
+Reads a board document in the export format: NDJSON or a JSON array of
+records tagged with "type", parents before children. Every record gets a
+fresh id from its table's sequence and rows are loaded with COPY in one
+transaction.
+
+    python -m app.importer board.ndjson --owner-id 1
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import psycopg2
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from . import ranking
+
+
+READ_SIZE = 1 << 16
+MAX_RECORD_SIZE = 1 << 24
+ID_BATCH_SIZE = 10000
+SPOOL_SIZE = 1 << 23
+
+# Tables in foreign key order with the columns written for each of them
+TABLES = {
+    "boards": ["id", "name", "owner_id", "created_at"],
+    "board_members": ["user_id", "board_id", "role"],
+    "lists": ["id", "name", "position", "rank", "board_id", "created_at"],
+    "cards": ["id", "title", "description", "position", "rank", "due_date", "list_id", "created_at"],
+    "card_members": ["user_id", "card_id"],
+    "comments": ["id", "comment_text", "card_id", "user_id", "created_at", "updated_at"],
+}
+
+
+class InvalidDocument(ValueError):
+    pass
+
+
+# Yields JSON values one at a time from NDJSON or a JSON array without reading the whole file
+def iter_records(file):
+    decoder = json.JSONDecoder()
+    buffer, position, eof, in_array = "", 0, False, None
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if in_array is None and position < len(buffer):
+            in_array = buffer[position] == "["
+            position += in_array
+            continue
+        if in_array and position < len(buffer) and buffer[position] == "]":
+            return
+        if position < len(buffer):
+            try:
+                value, position = decoder.raw_decode(buffer, position)
+                yield value
+                continue
+            except json.JSONDecodeError as error:
+                if eof or len(buffer) - position > MAX_RECORD_SIZE:
+                    raise InvalidDocument(f"invalid JSON: {error}")
+        elif eof:
+            if in_array:
+                raise InvalidDocument("unterminated JSON array")
+            return
+        chunk = file.read(READ_SIZE)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def copy_value(value):
+    if value is None:
+        return "\\N"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+class BoardImporter:
+    def __init__(self, db: Session, owner_id: int, progress=None, progress_every: int = 100000):
+        self.db = db
+        self.owner_id = owner_id
+        self.progress = progress
+        self.progress_every = progress_every
+        self.now = datetime.now(timezone.utc).isoformat()
+        self.board_id = None
+        self.id_maps = {"lists": {}, "cards": {}}
+        self.id_pools = {table: deque() for table in TABLES}
+        self.last_ranks = {}
+        self.user_ids = set()
+        self.counts = {table: 0 for table in TABLES}
+        self.files = {table: tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE, mode="w+", encoding="utf-8") for table in TABLES}
+
+    # Ids come from the table's own sequence, so imported rows never collide with existing ones.
+    # Batches grow with the number of rows seen, small boards don't burn thousands of ids.
+    def next_id(self, table: str):
+        pool = self.id_pools[table]
+        if not pool:
+            pool.extend(self.db.execute(text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :count)"),
+                                        {"table": table, "count": min(ID_BATCH_SIZE, self.counts[table] + 1)}).scalars())
+        return pool.popleft()
+
+    def parent_id(self, table: str, record: dict, key: str):
+        try:
+            return self.id_maps[table][record[key]]
+        except KeyError:
+            raise InvalidDocument(f"{record['type']} references unknown {key} {record.get(key)!r}")
+
+    def user_id(self, record: dict):
+        if record.get("user_id") is None:
+            raise InvalidDocument(f"{record['type']} without user_id")
+        self.user_ids.add(record["user_id"])
+        return record["user_id"]
+
+    # Ranks from the document are kept if they are valid keys, missing ones are appended after the highest rank seen in the same parent
+    def next_rank(self, parent: tuple, record: dict):
+        last_rank = self.last_ranks.get(parent)
+        rank = record.get("rank")
+        if rank is None:
+            rank = ranking.between(last_rank, None)
+        elif not ranking.is_valid(rank):
+            raise InvalidDocument(f"{record['type']} has invalid rank {rank!r}")
+        self.last_ranks[parent] = max(rank, last_rank or rank)
+        return rank
+
+    def position(self, table: str, record: dict):
+        return record["position"] if record.get("position") is not None else self.counts[table]
+
+    def write(self, table: str, row: dict):
+        self.files[table].write("\t".join(copy_value(row.get(column)) for column in TABLES[table]) + "\n")
+        self.counts[table] += 1
+
+    def add(self, record: dict):
+        record_type = record.get("type") if isinstance(record, dict) else None
+        if record_type == "board":
+            if self.board_id is not None:
+                raise InvalidDocument("document contains more than one board")
+            self.board_id = self.next_id("boards")
+            self.write("boards", {"id": self.board_id, "name": record.get("name") or "Imported board", "owner_id": self.owner_id, "created_at": record.get("created_at") or self.now})
+            return
+        if self.board_id is None:
+            raise InvalidDocument("the board record must come first")
+
+        if record_type == "board_member":
+            self.write("board_members", {"user_id": self.user_id(record), "board_id": self.board_id, "role": record.get("role") or "observer"})
+        elif record_type == "list":
+            list_id = self.id_maps["lists"][record.get("id")] = self.next_id("lists")
+            self.write("lists", {**record, "id": list_id, "board_id": self.board_id, "position": self.position("lists", record),
+                                 "rank": self.next_rank(("lists", self.board_id), record), "created_at": record.get("created_at") or self.now})
+        elif record_type == "card":
+            list_id = self.parent_id("lists", record, "list_id")
+            card_id = self.id_maps["cards"][record.get("id")] = self.next_id("cards")
+            self.write("cards", {**record, "id": card_id, "list_id": list_id, "position": self.position("cards", record),
+                                 "rank": self.next_rank(("cards", list_id), record), "created_at": record.get("created_at") or self.now})
+        elif record_type == "card_member":
+            self.write("card_members", {"user_id": self.user_id(record), "card_id": self.parent_id("cards", record, "card_id")})
+        elif record_type == "comment":
+            self.write("comments", {**record, "id": self.next_id("comments"), "card_id": self.parent_id("cards", record, "card_id"), "user_id": self.user_id(record),
+                                    "created_at": record.get("created_at") or self.now})
+        else:
+            raise InvalidDocument(f"unknown record type {record_type!r}")
+
+    def report(self, stage: str):
+        if self.progress:
+            self.progress(stage, self.counts)
+
+    def validate_users(self):
+        found = set(self.db.execute(text("SELECT id FROM users WHERE id = ANY(:ids)"), {"ids": list(self.user_ids)}).scalars())
+        missing = sorted(self.user_ids - found)
+        if missing:
+            raise InvalidDocument(f"unknown users {missing[:20]}")
+
+    def copy(self):
+        cursor = self.db.connection().connection.cursor()
+        try:
+            for table, columns in TABLES.items():
+                self.report(f"copying {table}")
+                file = self.files[table]
+                file.seek(0)
+                cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", file)
+        finally:
+            cursor.close()
+
+    # Loads the whole document in one transaction and returns the new board id with per-table row counts
+    def run(self, file):
+        try:
+            for number, record in enumerate(iter_records(file), 1):
+                self.add(record)
+                if number % self.progress_every == 0:
+                    self.report("parsing")
+            if self.board_id is None:
+                raise InvalidDocument("document has no board record")
+            self.validate_users()
+            self.copy()
+            self.db.commit()
+        except (psycopg2.IntegrityError, psycopg2.DataError) as error:
+            self.db.rollback()
+            raise InvalidDocument(str(error).strip())
+        except UnicodeDecodeError as error:
+            self.db.rollback()
+            raise InvalidDocument(f"document is not valid UTF-8: {error}")
+        except Exception:
+            self.db.rollback()
+            raise
+        finally:
+            for spooled in self.files.values():
+                spooled.close()
+        self.report("done")
+
+        return {"board_id": self.board_id, **self.counts}
+
+
+def import_board(db: Session, file, owner_id: int, progress=None):
+    return BoardImporter(db, owner_id, progress).run(file)
+
+
+def print_progress(stage: str, counts: dict):
+    print(f"{time.strftime('%H:%M:%S')} {stage}: " + ", ".join(f"{table} {count}" for table, count in counts.items()), file=sys.stderr)
+
+
+def main():
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Import a board document (NDJSON or JSON array) with COPY")
+    parser.add_argument("path", help="document to import, - for stdin")
+    parser.add_argument("--owner-id", type=int, required=True, help="user that will own the imported board")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    file = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8")
+    try:
+        result = import_board(db, file, args.owner_id, print_progress)
+    except InvalidDocument as error:
+        sys.exit(f"import failed: {error}")
+    finally:
+        file.close()
+        db.close()
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
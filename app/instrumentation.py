@@ -0,0 +1,187 @@
+import contextvars
+import functools
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import traceback
+
+from sqlalchemy import event
+
+from . import metrics
+from .config import settings
+
+
+logger = logging.getLogger(__name__)
+request_logger = logging.getLogger("app.requests")
+query_logger = logging.getLogger("app.queries")
+
+THIS_FILE = os.path.abspath(__file__)
+APP_DIR = os.path.dirname(THIS_FILE)
+EXPLAINABLE = ("select", "with")
+
+# Bound parameters of every DBAPI style, then literals, then lists of placeholders left by expanding IN and multi-row VALUES
+NORMALIZE_PATTERNS = [
+    (re.compile(r"%\(\w+\)s|\$\d+|(?<![:\w]):\w+|%s|\?"), "?"),
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(?)"),
+    (re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+"), "(?)"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+class RequestStats:
+    def __init__(self, request=None):
+        self.request = request
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.db_time = 0.0
+        self.pool_wait = 0.0
+        self.query_budget = None
+        self.fingerprints = {}
+        self.repeated = []
+
+
+request_stats = contextvars.ContextVar("request_stats", default=None)
+
+
+# Statement text with parameters and literals replaced, statements differing only in values share it
+@functools.lru_cache(maxsize=2048)
+def normalize(statement: str):
+    for pattern, replacement in NORMALIZE_PATTERNS:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+
+def fingerprint(statement: str):
+    return hashlib.blake2s(normalize(statement).encode(), digest_size=8).hexdigest()
+
+
+# Frames of this application that led to the statement, without SQLAlchemy, Starlette and this module
+def app_stack():
+    frames = [frame for frame in traceback.extract_stack() if frame.filename.startswith(APP_DIR) and frame.filename != THIS_FILE]
+    return "".join(traceback.format_list(frames))
+
+
+def describe(stats: RequestStats | None):
+    if stats is None or stats.request is None:
+        return "outside a request"
+    return f"{stats.request.method} {route_label(stats.request)}"
+
+
+# The same fingerprint repeating within one request is the lazy-load pattern: reported once per request and
+# fingerprint, when it reaches n_plus_one_threshold
+def check_repeated(stats: RequestStats, statement: str):
+    key = fingerprint(statement)
+    count = stats.fingerprints[key] = stats.fingerprints.get(key, 0) + 1
+    if count == settings.n_plus_one_threshold:
+        stats.repeated.append(key)
+        query_logger.warning("possible N+1 in %s: statement %s ran %d times\n%s\n%s", describe(stats), key, count, normalize(statement), app_stack())
+
+
+# Plain EXPLAIN on the same connection inside a savepoint, a failing EXPLAIN can't abort the caller's transaction
+def explain(conn, statement: str, parameters):
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute("SAVEPOINT explain_slow_query")
+        try:
+            cursor.execute(f"EXPLAIN {statement}", parameters)
+            plan = "\n".join(str(row[0]) for row in cursor.fetchall())
+            cursor.execute("RELEASE SAVEPOINT explain_slow_query")
+            return plan
+        except Exception as error:
+            cursor.execute("ROLLBACK TO SAVEPOINT explain_slow_query")
+            return f"EXPLAIN failed: {error!r}"
+    finally:
+        cursor.close()
+
+
+def log_slow_query(conn, statement: str, parameters, executemany: bool, elapsed: float, stats: RequestStats | None):
+    plan = None
+    if settings.slow_query_explain and not executemany and statement.lstrip().lower().startswith(EXPLAINABLE):
+        plan = explain(conn, statement, parameters)
+    query_logger.warning("slow query in %s: %.1f ms, statement %s\n%s%s\n%s", describe(stats), elapsed * 1000, fingerprint(statement), normalize(statement), 
+                         f"\n{plan}" if plan else "", app_stack())
+
+
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    stats = request_stats.get()
+    conn.info["query_started"] = time.perf_counter()
+    if stats is not None:
+        stats.query_count += 1
+        if settings.query_analysis:
+            check_repeated(stats, statement)
+
+
+def time_query(conn, cursor, statement, parameters, context, executemany):
+    stats = request_stats.get()
+    started = conn.info.pop("query_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    if stats is not None:
+        stats.db_time += elapsed
+    if settings.slow_query_threshold and elapsed >= settings.slow_query_threshold:
+        log_slow_query(conn, statement, parameters, executemany, elapsed, stats)
+
+
+def add_pool_wait(seconds: float):
+    stats = request_stats.get()
+    if stats is not None:
+        stats.pool_wait += seconds
+
+
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", count_query)
+    event.listen(engine, "after_cursor_execute", time_query)
+
+
+route_templates = {}
+
+
+# Path template of the matched route so metrics have one series per route, not per id
+def route_label(request):
+    endpoint = request.scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    if endpoint not in route_templates:
+        route_templates.update({route.endpoint: route.path for route in request.app.routes if hasattr(route, "endpoint")})
+    return route_templates.get(endpoint, "unmatched")
+
+
+# Timings cover the request until the response starts, bodies streamed afterwards aren't included
+def record_request(request, response, stats: RequestStats):
+    duration = time.perf_counter() - stats.started
+    route = route_label(request)
+    metrics.request_duration.labels(request.method, route, str(response.status_code)).observe(duration)
+    metrics.request_db_time.labels(request.method, route).observe(stats.db_time)
+    metrics.request_queries.labels(request.method, route).observe(stats.query_count)
+
+    response.headers["Server-Timing"] = (f'db;dur={stats.db_time * 1000:.1f};desc="{stats.query_count} queries", '
+                                         f"pool;dur={stats.pool_wait * 1000:.1f}, total;dur={duration * 1000:.1f}")
+    request_logger.info(json.dumps({"method": request.method, "route": route, "path": request.url.path, "status": response.status_code, 
+                                    "duration_ms": round(duration * 1000, 1), "queries": stats.query_count, "db_ms": round(stats.db_time * 1000, 1), 
+                                    "pool_wait_ms": round(stats.pool_wait * 1000, 1), "repeated_statements": stats.repeated}))
+
+
+# Route dependency declaring how many statements a request may emit
+class QueryBudget:
+    def __init__(self, limit: int):
+        self.limit = limit
+
+    def __call__(self):
+        stats = request_stats.get()
+        if stats is not None:
+            stats.query_budget = self.limit
+
+
+def check_query_budget(request, stats: RequestStats):
+    if stats.query_budget is None or stats.query_count <= stats.query_budget:
+        return
+    message = f"{request.method} {request.url.path} emitted {stats.query_count} queries, budget is {stats.query_budget}"
+    if settings.query_budget_enforce:
+        raise AssertionError(message)
+    logger.warning(message)
@@ -0,0 +1,102 @@
+import contextlib
+import smtplib
+import threading
+import time
+from collections import deque
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from .config import settings
+
+
+def invitation(board_id: int):
+    subject = 'Invitation to join a board'
+    html = f"<p>You have been invited to join a board.</p><p>Click the following link to accept the invitation: <a href='http://yourapp.com/boards/{board_id}'>http://yourapp.com/boards/{board_id}</a></p>"
+    return subject, html
+
+
+def build_message(recipient: str, subject: str, html: str):
+    message = MIMEMultipart()
+    message['Subject'] = subject
+    message['From'] = "Task Management App"
+    message['To'] = recipient
+    message.attach(MIMEText(html, 'html'))
+    return message
+
+
+# Host, port, STARTTLS and login are configurable so a local stand-in server (scripts/smtp_sink.py) can be used
+def connect():
+    smtp_server = smtplib.SMTP(settings.smtp_host, settings.smtp_port, timeout=settings.smtp_timeout)
+    try:
+        if settings.smtp_starttls:
+            smtp_server.starttls()
+        if settings.smtp_login:
+            smtp_server.login(settings.sender_email, settings.sender_password)
+    except Exception:
+        smtp_server.close()
+        raise
+    return smtp_server
+
+
+def send(smtp_server: smtplib.SMTP, recipient: str, subject: str, html: str):
+    smtp_server.sendmail(settings.sender_email, recipient, build_message(recipient, subject, html).as_string())
+
+
+def close_quietly(smtp_server: smtplib.SMTP):
+    with contextlib.suppress(smtplib.SMTPException, OSError):
+        smtp_server.quit()
+    smtp_server.close()
+
+
+# Keeps up to size logged-in SMTP sessions open between sends. A session idle for longer than
+# check_interval is probed with NOOP before reuse and replaced if the server dropped it.
+class SMTPPool:
+    def __init__(self, size: int, check_interval: float, max_idle: float):
+        self.size = size
+        self.check_interval = check_interval
+        self.max_idle = max_idle
+        self.idle = deque()
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(size)
+
+    def healthy(self, smtp_server: smtplib.SMTP, idle_for: float):
+        if idle_for > self.max_idle:
+            return False
+        if idle_for < self.check_interval:
+            return True
+        try:
+            return smtp_server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                if not self.idle:
+                    break
+                smtp_server, released_at = self.idle.pop()
+            if self.healthy(smtp_server, time.monotonic() - released_at):
+                return smtp_server
+            close_quietly(smtp_server)
+        return connect()
+
+    @contextlib.contextmanager
+    def connection(self):
+        with self.slots:
+            smtp_server = self.acquire()
+            try:
+                yield smtp_server
+            except BaseException:
+                close_quietly(smtp_server)
+                raise
+            with self.lock:
+                self.idle.append((smtp_server, time.monotonic()))
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, deque()
+        for smtp_server, _ in idle:
+            close_quietly(smtp_server)
+
+
+pool = SMTPPool(settings.smtp_pool_size, settings.smtp_pool_check_interval, settings.smtp_pool_max_idle)
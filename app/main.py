@@ -1,7 +1,10 @@
-from fastapi import FastAPI
+import anyio
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
-from .routers import user, auth, board, list, card, comment, board_member
+from . import utils, database, pagination, instrumentation, background, mailer, realtime
+from .config import settings
+from .routers import user, auth, board, list, card, comment, board_member, metrics
 
 app = FastAPI()
 
@@ -15,6 +18,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[pagination.NEXT_CURSOR_HEADER],
 )
 
 app.include_router(user.router)
@@ -24,6 +28,36 @@ app.include_router(list.router)
 app.include_router(card.router)
 app.include_router(comment.router)
 app.include_router(board_member.router)
+app.include_router(metrics.router)
+
+
+@app.middleware("http")
+async def track_queries(request: Request, call_next):
+    stats = instrumentation.RequestStats(request)
+    token = instrumentation.request_stats.set(stats)
+    try:
+        response = await call_next(request)
+    finally:
+        instrumentation.request_stats.reset(token)
+    instrumentation.record_request(request, response, stats)
+    instrumentation.check_query_budget(request, stats)
+    return response
+
+
+@app.on_event("startup")
+async def startup():
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.threadpool_limit
+    background.start()
+    realtime.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await background.stop()
+    await realtime.stop()
+    utils.shutdown_password_executor()
+    mailer.pool.close()
+    await database.async_engine.dispose()
 
 
 @app.get("/")
@@ -0,0 +1,76 @@
+import bisect
+import threading
+
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            cumulative = 0
+            buckets = {}
+            for le, count in zip(self.buckets + (float("inf"),), self.counts):
+                cumulative += count
+                buckets["+Inf" if le == float("inf") else str(le)] = cumulative
+            return {"buckets": buckets, "count": self.count, "sum": self.sum}
+
+
+def escape_label(value: str):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Histograms of one metric keyed by label values, rendered in the Prometheus text format
+class HistogramFamily:
+    def __init__(self, name: str, help: str, label_names: list[str], buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.buckets = buckets
+        self.children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        child = self.children.get(values)
+        if child is None:
+            with self._lock:
+                child = self.children.setdefault(values, Histogram(self.buckets))
+        return child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, histogram in list(self.children.items()):
+            labels = ",".join(f'{name}="{escape_label(value)}"' for name, value in zip(self.label_names, values))
+            snapshot = histogram.snapshot()
+            for le, count in snapshot["buckets"].items():
+                lines.append(f'{self.name}_bucket{{{labels + "," if labels else ""}le="{le}"}} {count}')
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {snapshot['sum']}")
+            lines.append(f"{self.name}_count{suffix} {snapshot['count']}")
+        return lines
+
+
+pool_checkout_wait = HistogramFamily("db_pool_checkout_wait_seconds", "Time spent waiting for a pooled database connection.", ["pool"])
+request_duration = HistogramFamily("http_request_duration_seconds", "HTTP request latency until the response starts.", ["method", "route", "status"])
+request_db_time = HistogramFamily("http_request_db_seconds", "Time spent executing SQL statements per HTTP request.", ["method", "route"])
+request_queries = HistogramFamily("http_request_queries", "SQL statements executed per HTTP request.", ["method", "route"], QUERY_COUNT_BUCKETS)
+
+registry = [request_duration, request_db_time, request_queries, pool_checkout_wait]
+
+
+def render():
+    return "\n".join(line for family in registry for line in family.render()) + "\n"
@@ -1,9 +1,21 @@
-from sqlalchemy import Column, Integer, String, Boolean, TIMESTAMP, text, ForeignKey, Table
-from sqlalchemy.orm import relationship
+from sqlalchemy import BigInteger, Column, Integer, String, Boolean, TIMESTAMP, text, ForeignKey, Table, Index, UniqueConstraint, func, literal_column
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, column_property
 
 from .database import Base
 
 
+# Full-text vectors are indexed as expressions (a stored column would rewrite the table), queries use the same
+# expression so the planner matches the index. The config is a literal, a bound parameter wouldn't match it.
+def english_vector(column, weight: str | None = None):
+    vector = func.to_tsvector(literal_column("'english'"), column, type_=TSVECTOR)
+    return vector if weight is None else func.setweight(vector, literal_column(f"'{weight}'"), type_=TSVECTOR)
+
+
+def card_search_vector(title, description):
+    return english_vector(func.coalesce(title, literal_column("''")), "A").op("||", return_type=TSVECTOR)(english_vector(func.coalesce(description, literal_column("''")), "B"))
+
+
 # CardMembers = Table('card_members', Base.metadata,
 #     Column('user_id', Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
 #     Column('card_id', Integer, ForeignKey('cards.id', ondelete='CASCADE'), primary_key=True)
@@ -16,6 +28,8 @@ class CardMembers(Base):
     user_id = Column('user_id', Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
     card_id = Column('card_id', Integer, ForeignKey('cards.id', ondelete='CASCADE'), primary_key=True)
 
+    __table_args__ = (Index('ix_card_members_card_id', 'card_id'),)
+
 
 class User(Base):
     __tablename__ = "users"
@@ -38,9 +52,16 @@ class Board(Base):
     name = Column(String, nullable=False)
     owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'))
+    # Bumped by every write to the board or anything on it, see events.publish
+    revision = Column(BigInteger, nullable=False, server_default=text('0'))
+    # Highest board_changes.seq removed by retention, change feeds starting before it can't be served
+    changes_pruned_through = Column(BigInteger, nullable=False, server_default=text('0'))
 
     owner = relationship('User', back_populates='boards')
-    lists = relationship('List', back_populates='board')
+    lists = relationship('List', back_populates='board', order_by='List.rank')
+
+    __table_args__ = (Index('ix_boards_owner_id_id', 'owner_id', 'id'), 
+                      Index('ix_boards_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}))
 
 
 class List(Base):
@@ -48,13 +69,17 @@ class List(Base):
 
     id = Column(Integer, autoincrement=True, primary_key=True, nullable=False)
     name = Column(String, nullable=False)
-    position = Column(Integer, nullable=False, primary_key=True)
-    board_id = Column(Integer, ForeignKey("boards.id", ondelete="CASCADE"), nullable=False, primary_key=True)
+    position = Column(Integer, nullable=False)
+    rank = Column(String(collation="C"), nullable=False)
+    board_id = Column(Integer, ForeignKey("boards.id", ondelete="CASCADE"), nullable=False)
     created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'))
     
     board = relationship('Board', back_populates='lists')
     cards = relationship('Card', back_populates='list')
 
+    __table_args__ = (Index('ix_lists_board_id_position', 'board_id', 'position'), 
+                      UniqueConstraint('board_id', 'rank', name='uq_lists_board_id_rank', deferrable=True, initially='IMMEDIATE'))
+
 
 class Card(Base):
     __tablename__ = "cards"
@@ -62,15 +87,21 @@ class Card(Base):
     id = Column(Integer, autoincrement=True, primary_key=True, nullable=False)
     title = Column(String, nullable=False)
     description = Column(String, nullable=True)
-    position = Column(Integer, nullable=False, primary_key=True)
+    position = Column(Integer, nullable=False)
+    rank = Column(String(collation="C"), nullable=False)
     due_date = Column(TIMESTAMP(timezone=True), nullable=True)
-    list_id = Column(Integer, ForeignKey("lists.id", ondelete="CASCADE"), nullable=False, primary_key=True)
+    list_id = Column(Integer, ForeignKey("lists.id", ondelete="CASCADE"), nullable=False)
     created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'))
+    search_vector = column_property(card_search_vector(title, description), deferred=True)
 
     list = relationship('List', back_populates='cards')
     # users = relationship('User', secondary=CardMembers, back_populates='cards')
     comments = relationship('Comment', back_populates="card")
 
+    __table_args__ = (Index('ix_cards_due_date', 'due_date'), 
+                      Index('ix_cards_search_vector', card_search_vector(title, description), postgresql_using='gin'), 
+                      UniqueConstraint('list_id', 'rank', name='uq_cards_list_id_rank', deferrable=True, initially='IMMEDIATE'))
+
 
 class Comment(Base):
     __tablename__ = "comments"
@@ -81,10 +112,15 @@ class Comment(Base):
     user_id = Column(Integer, ForeignKey('users.id', ondelete="CASCADE"), nullable=False)
     created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'))
     updated_at = Column(TIMESTAMP(timezone=True), nullable=True)
+    search_vector = column_property(english_vector(comment_text), deferred=True)
 
     card = relationship('Card', back_populates='comments')
     user = relationship('User', back_populates='comments')
 
+    __table_args__ = (Index('ix_comments_card_id_created_at_id', 'card_id', 'created_at', 'id'), 
+                      Index('ix_comments_user_id', 'user_id'), 
+                      Index('ix_comments_search_vector', english_vector(comment_text), postgresql_using='gin'))
+
 
 class BoardMember(Base):
     __tablename__ = "board_members"
@@ -94,3 +130,38 @@ class BoardMember(Base):
     role = Column(String, nullable=False, server_default="observer")
 
     board = relationship('Board')
+
+    __table_args__ = (Index('ix_board_members_board_id', 'board_id'),)
+
+
+class OutboxMessage(Base):
+    __tablename__ = "outbox_messages"
+
+    id = Column(Integer, primary_key=True, nullable=False)
+    recipient = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(String, nullable=False)
+    attempts = Column(Integer, nullable=False, server_default=text('0'))
+    next_attempt_at = Column(TIMESTAMP(timezone=True), nullable=True, server_default=text('now()'))
+    sent_at = Column(TIMESTAMP(timezone=True), nullable=True)
+    last_error = Column(String, nullable=True)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'))
+
+    # Only pending messages are indexed, sent and abandoned ones (next_attempt_at is NULL) stay out of it
+    __table_args__ = (Index('ix_outbox_messages_next_attempt_at', 'next_attempt_at', postgresql_where=text('sent_at IS NULL AND next_attempt_at IS NOT NULL')),)
+
+
+# Append-only log of which entities of a board changed, written with every board event
+class BoardChange(Base):
+    __tablename__ = "board_changes"
+
+    seq = Column(BigInteger, primary_key=True, nullable=False)
+    board_id = Column(Integer, ForeignKey("boards.id", ondelete="CASCADE"), nullable=False)
+    revision = Column(BigInteger, nullable=False)
+    entity = Column(String, nullable=False)
+    entity_id = Column(String, nullable=False)
+    deleted = Column(Boolean, nullable=False, server_default=text('false'))
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'))
+
+    __table_args__ = (Index('ix_board_changes_board_id_seq', 'board_id', 'seq'), 
+                      Index('ix_board_changes_created_at', 'created_at'))
@@ -1,20 +1,29 @@
+import hashlib
+import hmac
+import time
 from datetime import datetime, timedelta
 
 from jose import JWTError, jwt
 from fastapi import Depends, status, HTTPException
-from fastapi.security import OAuth2PasswordBearer
+from fastapi.security import OAuth2PasswordBearer, HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 
-from . import schemas, database, models
+from . import schemas, database, models, cache
 from .config import settings
 from .crud import users_crud
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='login')
+metrics_scheme = HTTPBearer(auto_error=False)
 
 SECRET_KEY = settings.secret_key
 ALGORITHM = settings.algorithm
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.access_token_expire_minutes
 
+# uid -> schemas.User, token hash -> schemas.TokenData (kept until the token's exp)
+principals = cache.LRUCache(settings.principal_cache_size, settings.principal_cache_ttl)
+verified_tokens = cache.LRUCache(settings.principal_cache_size)
+
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -26,6 +35,11 @@ def create_access_token(data: dict):
 
 
 def verify_access_token(token: str, credentials_exception):
+    token_hash = hashlib.sha256(token.encode()).hexdigest()
+    token_data = verified_tokens.get(token_hash)
+    if token_data is not cache.MISSING:
+        return token_data
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         uid: str = payload.get("uid")
@@ -35,14 +49,51 @@ def verify_access_token(token: str, credentials_exception):
     except JWTError:
         raise credentials_exception
 
+    expires_in = payload.get("exp", 0) - time.time()
+    if expires_in > 0:
+        verified_tokens.set(token_hash, token_data, ttl=expires_in)
+
     return token_data
 
 
+def evict_principal(user_id):
+    principals.delete(str(user_id))
+
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _evict_changed_user(mapper, connection, target):
+    evict_principal(target.id)
+
+
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
     credentials_exception = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=f"Could not validate credentials", headers={"WWW-Authenticate": "Bearer"})
     token_data = verify_access_token(token, credentials_exception)
-    user = users_crud.get_user_by_id(db, token_data.uid)
-    if not user:
-        raise credentials_exception
+    user = principals.get(token_data.uid)
+    if user is cache.MISSING:
+        user = users_crud.get_user_by_id(db, token_data.uid)
+        if not user:
+            raise credentials_exception
+        user = schemas.User.from_orm(user)
+        principals.set(token_data.uid, user)
     
     return user
+
+
+# With auth_claims_only enabled, routes that only need the caller's id never touch the users table
+def get_current_principal(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+    if settings.auth_claims_only:
+        credentials_exception = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=f"Could not validate credentials", headers={"WWW-Authenticate": "Bearer"})
+        token_data = verify_access_token(token, credentials_exception)
+        return schemas.Principal(id=token_data.uid)
+
+    return get_current_user(token, db)
+
+
+# Operational endpoints are for the scraper, which sends settings.metrics_token as its bearer token.
+# Without a configured token they don't exist.
+def verify_metrics_token(credentials: HTTPAuthorizationCredentials | None = Depends(metrics_scheme)):
+    if settings.metrics_token is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if credentials is None or not hmac.compare_digest(credentials.credentials.encode(), settings.metrics_token.encode()):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials", headers={"WWW-Authenticate": "Bearer"})
@@ -0,0 +1,57 @@
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException, status
+from sqlalchemy import tuple_, TIMESTAMP
+
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values):
+    raw = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+# JSON type a cursor value must have for the column, timestamps travel as ISO strings
+def cursor_value_types(column):
+    if isinstance(column.type, TIMESTAMP):
+        return (str,)
+    python_type = column.type.python_type
+    return (int, float) if python_type is float else (python_type,)
+
+
+def decode_cursor(cursor: str, columns):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError(cursor)
+        for column, value in zip(columns, values):
+            if isinstance(value, bool) or not isinstance(value, cursor_value_types(column)):
+                raise ValueError(cursor)
+        return [datetime.fromisoformat(value) if isinstance(column.type, TIMESTAMP) else value for column, value in zip(columns, values)]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="invalid cursor")
+
+
+# Keyset pagination: rows strictly after the cursor in (columns) order, the last column must be unique.
+# cursor_values extracts the ordering values from a result row when they are not plain attributes.
+def paginate(query, columns, limit: int, after: str | None = None, cursor_values=None):
+    if after:
+        query = query.filter(tuple_(*columns) > tuple_(*decode_cursor(after, columns)))
+    items = query.order_by(*columns).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        values = cursor_values(items[-1]) if cursor_values else [getattr(items[-1], column.key) for column in columns]
+        next_cursor = encode_cursor(values)
+    return items, next_cursor
+
+
+def set_next_cursor(response, next_cursor: str | None):
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
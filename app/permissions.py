@@ -0,0 +1,52 @@
+from typing import Annotated
+
+from fastapi import Depends
+from sqlalchemy.orm import Session
+
+from . import schemas, oauth2, utils
+from .database import get_db, SessionLocal
+from .crud import boards_crud
+
+
+READ_ROLES = [utils.Roles.ADMIN.value, utils.Roles.MEMBER.value, utils.Roles.OBSERVER.value]
+WRITE_ROLES = [utils.Roles.ADMIN.value, utils.Roles.MEMBER.value]
+ADMIN_ROLES = [utils.Roles.ADMIN.value]
+
+
+# Dependencies resolving board -> list -> card plus the caller's role in one query
+class BoardAccess:
+    def __init__(self, roles: list[str]):
+        self.roles = roles
+
+    def __call__(self, board_id: int, db: Annotated[Session, Depends(get_db)], current_user: Annotated[schemas.Principal, Depends(oauth2.get_current_principal)]):
+        return boards_crud.validate_board_path(db, board_id, current_user.id, self.roles)
+
+
+class ListAccess(BoardAccess):
+    def __call__(self, board_id: int, list_id: int, db: Annotated[Session, Depends(get_db)], current_user: Annotated[schemas.Principal, Depends(oauth2.get_current_principal)]):
+        return boards_crud.validate_board_path(db, board_id, current_user.id, self.roles, list_id=list_id)
+
+
+class CardAccess(BoardAccess):
+    def __call__(self, board_id: int, list_id: int, card_id: int, db: Annotated[Session, Depends(get_db)], current_user: Annotated[schemas.Principal, Depends(oauth2.get_current_principal)]):
+        return boards_crud.validate_board_path(db, board_id, current_user.id, self.roles, list_id=list_id, card_id=card_id)
+
+
+# WebSocket handshakes from browsers can't carry an Authorization header, the token comes as a query parameter.
+# Uses its own session so none is held for the lifetime of the socket. Returns the authorized principal.
+def authorize_websocket(board_id: int, token: str, roles: list[str]):
+    db = SessionLocal()
+    try:
+        current_user = oauth2.get_current_principal(token, db)
+        boards_crud.validate_board_path(db, board_id, current_user.id, roles)
+        return current_user
+    finally:
+        db.close()
+
+
+read_board = BoardAccess(READ_ROLES)
+write_board = BoardAccess(WRITE_ROLES)
+read_list = ListAccess(READ_ROLES)
+write_list = ListAccess(WRITE_ROLES)
+read_card = CardAccess(READ_ROLES)
+write_card = CardAccess(WRITE_ROLES)
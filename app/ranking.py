@@ -0,0 +1,92 @@
+# Fractional rank keys: base-36 strings ordered bytewise (columns use COLLATE "C").
+# A key never ends with "0", so there is always room for another key between two neighbours.
+DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+BASE = len(DIGITS)
+WIDTH = 6
+STEP = BASE ** 3
+
+
+def encode(value: int, width: int = WIDTH):
+    digits = []
+    for _ in range(width):
+        value, remainder = divmod(value, BASE)
+        digits.append(DIGITS[remainder])
+    return "".join(reversed(digits)).rstrip("0")
+
+
+def decode(key: str, width: int = WIDTH):
+    return int(key[:width].ljust(width, "0"), BASE)
+
+
+def is_valid(key):
+    return isinstance(key, str) and key != "" and not key.endswith("0") and all(digit in DIGITS for digit in key)
+
+
+def midpoint(a: str, b: str | None):
+    if b is not None and a >= b:
+        raise ValueError(f"{a!r} is not before {b!r}")
+    if b is not None:
+        n = 0
+        while (a[n] if n < len(a) else "0") == b[n]:
+            n += 1
+        if n > 0:
+            return b[:n] + midpoint(a[n:], b[n:])
+
+    digit_a = DIGITS.index(a[0]) if a else 0
+    digit_b = DIGITS.index(b[0]) if b is not None else BASE
+    if digit_b - digit_a > 1:
+        return DIGITS[round((digit_a + digit_b) / 2)]
+    if b is not None and len(b) > 1:
+        return b[:1]
+    return DIGITS[digit_a] + midpoint(a[1:], None)
+
+
+# Appending/prepending moves by a fixed step so repeated inserts at the ends keep keys short
+def key_after(a: str):
+    value = decode(a) + STEP
+    if value < BASE ** WIDTH:
+        return encode(value)
+    return midpoint(a, None)
+
+
+def key_before(b: str):
+    value = decode(b) - STEP
+    if value > 0:
+        return encode(value)
+    return midpoint("", b)
+
+
+def between(before: str | None, after: str | None):
+    if before is None and after is None:
+        return encode(BASE ** WIDTH // 2)
+    if after is None:
+        return key_after(before)
+    if before is None:
+        return key_before(after)
+    return midpoint(before, after)
+
+
+# n keys appended after before, each one a fixed step further
+def keys_after(before: str | None, n: int):
+    keys = []
+    for _ in range(n):
+        before = between(before, None)
+        keys.append(before)
+    return keys
+
+
+def between_n(before: str | None, after: str | None, n: int):
+    if n == 0:
+        return []
+    middle = between(before, after)
+    left = n // 2
+    return between_n(before, middle, left) + [middle] + between_n(middle, after, n - left - 1)
+
+
+# n evenly spaced keys, used for backfills and rebalancing
+def spread(n: int):
+    width = WIDTH
+    while BASE ** width <= n:
+        width += 1
+    gap = BASE ** width // (n + 1)
+    return [encode(gap * (i + 1), width) for i in range(n)]
@@ -0,0 +1,162 @@
+import asyncio
+import json
+import logging
+
+import asyncpg
+from fastapi import WebSocket, WebSocketDisconnect, status
+
+from . import events, response_cache, permissions
+from .config import settings
+from .database import SQLALCHEMY_DATABASE_URL
+from .crud import users_crud
+
+
+logger = logging.getLogger(__name__)
+
+RESYNC = json.dumps({"type": "resync"})
+# Close code telling a client it fell behind and has to reconnect and refetch the board
+SLOW_CONSUMER_CLOSE_CODE = 4008
+
+
+class Subscriber:
+    def __init__(self, board_id: int, user_id: int, queue_size: int):
+        self.board_id = board_id
+        self.user_id = user_id
+        self.queue = asyncio.Queue(queue_size)
+        self.dropped = False
+
+
+# Per-board sets of subscribers of this worker. Payloads are forwarded as received, nothing is re-encoded per subscriber.
+class Broker:
+    def __init__(self):
+        self.boards = {}
+
+    def subscribe(self, board_id: int, user_id: int):
+        subscriber = Subscriber(board_id, user_id, settings.realtime_queue_size)
+        self.boards.setdefault(board_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscribers = self.boards.get(subscriber.board_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.boards[subscriber.board_id]
+
+    # Pending events are discarded and the socket is closed with code once the sender gets to it
+    def close(self, subscriber: Subscriber, code: int):
+        self.unsubscribe(subscriber)
+        subscriber.dropped = True
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(code)
+
+    # A subscriber whose queue is full is dropped instead of buffering without bound or stalling the others
+    def send(self, subscriber: Subscriber, payload: str):
+        try:
+            subscriber.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            self.close(subscriber, SLOW_CONSUMER_CLOSE_CODE)
+
+    # Sockets are only authorized at connect, a member losing read access is disconnected before the event reaches anyone
+    def revoke(self, board_id: int, user_id: int):
+        for subscriber in list(self.boards.get(board_id, ())):
+            if subscriber.user_id == user_id:
+                self.close(subscriber, status.WS_1008_POLICY_VIOLATION)
+
+    def dispatch(self, payload: str):
+        event = json.loads(payload)
+        if event["type"].startswith("member"):
+            user_ids = event["data"]["user_ids"] if event["type"] == "members.added" else [event["data"]["user_id"]]
+            for user_id in user_ids:
+                users_crud.invalidate_board_role(user_id, event["board_id"], broadcast=False)
+            if event["type"] == "member.removed" or (event["type"] == "member.updated" and event["data"]["role"] not in permissions.READ_ROLES):
+                self.revoke(event["board_id"], event["data"]["user_id"])
+        response_cache.invalidate_local(event["board_id"])
+        for subscriber in list(self.boards.get(event["board_id"], ())):
+            self.send(subscriber, payload)
+
+    def broadcast(self, payload: str):
+        for subscribers in list(self.boards.values()):
+            for subscriber in list(subscribers):
+                self.send(subscriber, payload)
+
+    def stats(self):
+        return {"boards": len(self.boards), "subscribers": sum(len(subscribers) for subscribers in self.boards.values())}
+
+
+broker = Broker()
+listener = None
+
+
+def on_notification(connection, pid, channel, payload):
+    try:
+        broker.dispatch(payload)
+    except (ValueError, KeyError, TypeError):
+        logger.warning("ignoring malformed board event %r", payload[:200])
+
+
+# One LISTEN connection per worker. Events committed while it was down are lost, so subscribers are told
+# to resync after every reconnect.
+async def listen():
+    connected_before = False
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(SQLALCHEMY_DATABASE_URL)
+            closed = asyncio.Event()
+            connection.add_termination_listener(lambda _: closed.set())
+            await connection.add_listener(events.CHANNEL, on_notification)
+            if connected_before:
+                broker.broadcast(RESYNC)
+            connected_before = True
+            while not closed.is_set():
+                try:
+                    await asyncio.wait_for(closed.wait(), settings.realtime_keepalive_interval)
+                except asyncio.TimeoutError:
+                    await connection.fetchval("SELECT 1", timeout=settings.realtime_keepalive_interval)
+        except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError) as error:
+            logger.warning("board event listener disconnected: %r", error)
+        finally:
+            if connection is not None:
+                connection.terminate()
+        await asyncio.sleep(settings.realtime_reconnect_delay)
+
+
+def start():
+    global listener
+    listener = asyncio.create_task(listen())
+
+
+async def stop():
+    if listener is not None:
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
+
+
+# Strings are events, an int is the close code put there by Broker.close
+async def send_events(websocket: WebSocket, subscriber: Subscriber):
+    while isinstance(payload := await subscriber.queue.get(), str):
+        await websocket.send_text(payload)
+    await websocket.close(code=payload)
+
+
+# Clients only listen, incoming messages are read to notice disconnects
+async def receive_until_closed(websocket: WebSocket):
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+
+
+async def stream(websocket: WebSocket, board_id: int, user_id: int):
+    subscriber = broker.subscribe(board_id, user_id)
+    tasks = [asyncio.create_task(send_events(websocket, subscriber)), asyncio.create_task(receive_until_closed(websocket))]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        broker.unsubscribe(subscriber)
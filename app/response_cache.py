@@ -0,0 +1,235 @@
+import logging
+import socket
+import threading
+import time
+from collections import OrderedDict
+
+import orjson
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from . import events, models, pagination
+from .config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Headers stored with the body, the rest (ETag, Cache-Control) is computed per request
+CACHED_HEADERS = [pagination.NEXT_CURSOR_HEADER]
+
+
+# Byte-bounded LRU of serialized responses in this process, indexed per board so a board is invalidated without a scan
+class MemoryBackend:
+    shared = False
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._boards = {}
+        self._lock = threading.Lock()
+
+    def get(self, board_id: int, key: str):
+        with self._lock:
+            item = self._data.get((board_id, key))
+            if item is not None:
+                value, expires_at = item
+                if expires_at > time.monotonic():
+                    self._data.move_to_end((board_id, key))
+                    self.hits += 1
+                    return value
+                self._remove((board_id, key))
+            self.misses += 1
+            return None
+
+    def set(self, board_id: int, key: str, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            self._remove((board_id, key))
+            self._data[(board_id, key)] = (value, time.monotonic() + self.ttl)
+            self._boards.setdefault(board_id, set()).add(key)
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._data)))
+
+    # Callers hold the lock
+    def _remove(self, entry: tuple):
+        item = self._data.pop(entry, None)
+        if item is not None:
+            self.size -= len(item[0])
+            keys = self._boards[entry[0]]
+            keys.discard(entry[1])
+            if not keys:
+                del self._boards[entry[0]]
+
+    def invalidate(self, board_id: int):
+        with self._lock:
+            for key in list(self._boards.get(board_id, ())):
+                self._remove((board_id, key))
+
+    def stats(self):
+        return {"backend": "memory", "entries": len(self._data), "bytes": self.size, "max_bytes": self.max_bytes, "hits": self.hits, "misses": self.misses}
+
+
+class RedisError(Exception):
+    pass
+
+
+def encode_command(*args):
+    parts = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode()
+        parts.append(f"${len(data)}\r\n".encode() + data + b"\r\n")
+    return b"".join(parts)
+
+
+def read_reply(reader):
+    line = reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise RedisError("connection closed")
+    prefix, rest = line[:1], line[1:-2]
+    if prefix == b"+":
+        return rest
+    if prefix == b"-":
+        raise RedisError(rest.decode(errors="replace"))
+    if prefix == b":":
+        return int(rest)
+    if prefix == b"$":
+        length = int(rest)
+        return None if length < 0 else reader.read(length + 2)[:-2]
+    if prefix == b"*":
+        length = int(rest)
+        return None if length < 0 else [read_reply(reader) for _ in range(length)]
+    raise RedisError(f"unexpected reply {line[:50]!r}")
+
+
+# Speaks the few RESP commands it needs to Redis (or scripts/resp_server.py), one connection per thread.
+# A board's entries live in one hash, invalidating the board is a single DEL. Memory limits and eviction are the
+# server's (maxmemory with allkeys-lru). Errors only count as misses, the cache never fails a request: after one,
+# the server isn't tried again for retry_interval seconds, so an outage doesn't add connect timeouts to every read.
+class RedisBackend:
+    shared = True
+
+    def __init__(self, host: str, port: int, timeout: float, ttl: float, retry_interval: float):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        self.retry_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.skipped = 0
+        self._local = threading.local()
+
+    def _connection(self):
+        if getattr(self._local, "connection", None) is None:
+            connection = socket.create_connection((self.host, self.port), self.timeout)
+            self._local.connection, self._local.reader = connection, connection.makefile("rb")
+        return self._local.connection, self._local.reader
+
+    def _disconnect(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            self._local.reader.close()
+            connection.close()
+            self._local.connection = self._local.reader = None
+
+    # Pipelines the commands in one write and returns their replies, None if the server can't be used
+    def execute(self, *commands):
+        if time.monotonic() < self.retry_at:
+            self.skipped += 1
+            return None
+        try:
+            connection, reader = self._connection()
+            connection.sendall(b"".join(encode_command(*command) for command in commands))
+            return [read_reply(reader) for _ in commands]
+        except (OSError, ValueError, RedisError) as error:
+            self._disconnect()
+            self.errors += 1
+            # the breaker opens at most once per retry_interval, and so does the warning
+            if time.monotonic() >= self.retry_at:
+                self.retry_at = time.monotonic() + self.retry_interval
+                logger.warning("response cache server unavailable, retrying in %.0fs: %r", self.retry_interval, error)
+            return None
+
+    def get(self, board_id: int, key: str):
+        replies = self.execute(("HGET", f"responses:{board_id}", key))
+        value = replies[0] if replies else None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, board_id: int, key: str, value: bytes):
+        self.execute(("HSET", f"responses:{board_id}", key, value), ("PEXPIRE", f"responses:{board_id}", int(self.ttl * 1000)))
+
+    def invalidate(self, board_id: int):
+        self.execute(("DEL", f"responses:{board_id}"))
+
+    def stats(self):
+        return {"backend": "redis", "hits": self.hits, "misses": self.misses, "errors": self.errors, "skipped": self.skipped}
+
+
+def create_backend():
+    if settings.response_cache_backend == "memory":
+        return MemoryBackend(settings.response_cache_max_bytes, settings.response_cache_ttl)
+    if settings.response_cache_backend == "redis":
+        return RedisBackend(settings.response_cache_redis_host, settings.response_cache_redis_port, settings.response_cache_redis_timeout, settings.response_cache_ttl, 
+                            settings.response_cache_redis_retry_interval)
+    return None
+
+
+backend = create_backend()
+
+
+# Writes record their boards in the session (events.publish), entries are dropped once the transaction commits
+@event.listens_for(Session, "after_commit")
+def invalidate_committed(session: Session):
+    for board_id in session.info.pop(events.CHANGED_BOARDS, ()):
+        if backend is not None:
+            backend.invalidate(board_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def forget_rolled_back(session: Session):
+    session.info.pop(events.CHANGED_BOARDS, None)
+
+
+# For board events committed by other workers, which only reach this process through NOTIFY
+def invalidate_local(board_id: int):
+    if backend is not None and not backend.shared:
+        backend.invalidate(board_id)
+
+
+# The board's revision is part of the key: a worker that missed an invalidation can't serve an outdated body either
+def cache_key(request: Request, board: models.Board):
+    return f"{board.revision}:{request.url.path}?{request.url.query}"
+
+
+# Cached body for the request as a response with the headers already set on response. Callers run their
+# permission checks first, only the serialized body is shared between users.
+def lookup(request: Request, board: models.Board, response: Response):
+    if backend is None:
+        return None
+    value = backend.get(board.id, cache_key(request, board))
+    if value is None:
+        return None
+    headers, _, body = value.partition(b"\n")
+    cached = Response(body, media_type="application/json", headers=response.headers)
+    cached.headers.update(orjson.loads(headers))
+    return cached
+
+
+def store(request: Request, board: models.Board, response: Response):
+    if backend is not None:
+        headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+        backend.set(board.id, cache_key(request, board), orjson.dumps(headers) + b"\n" + response.body)
+    return response
@@ -0,0 +1,9 @@
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+
+
+# Read-only collection endpoints skip response_model validation: crud returns plain dicts built from row mappings
+# and orjson encodes them to bytes in one call. The route's response_model is still what OpenAPI documents, so the
+# dicts have to keep its shape. Headers already set on the injected response (ETag, next cursor) are carried over.
+def fast_json(content, response: Response):
+    return ORJSONResponse(content, headers=response.headers)
@@ -5,7 +5,7 @@ from fastapi.security.oauth2 import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 
 from .. import database, schemas, models, utils, oauth2
-from ..crud import users_crud
+from ..crud import aio
 
 
 router = APIRouter(
@@ -14,14 +14,17 @@ router = APIRouter(
 
 
 @router.post("/login", response_model=schemas.Token)
-def login(user_credentials: Annotated[OAuth2PasswordRequestForm, Depends()], db: Session = Depends(database.get_db)):
-    user = users_crud.get_user_by_email(db, user_credentials.username)
+async def login(user_credentials: Annotated[OAuth2PasswordRequestForm, Depends()], db: Session = Depends(database.get_session)):
+    user = await aio.users_crud.get_user_by_email(db, user_credentials.username)
     if not user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid Credentials")
     
-    if not utils.verify(user_credentials.password, user.password):
+    valid, new_hash = await utils.verify_async(user_credentials.password, user.password)
+    if not valid:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid Credentials")
     
     access_token = oauth2.create_access_token(data={"uid": user.id})
+    if new_hash:
+        await aio.users_crud.update_user_password(db, user, new_hash)
 
     return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
@@ -1,16 +1,20 @@
 from typing import Annotated
+import io
+import tempfile
 
 
-from fastapi import APIRouter, Depends, status, Response, HTTPException
+from fastapi import APIRouter, Depends, status, Response, HTTPException, Query, Request, WebSocket
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
 from ..database import get_db
-from .. import schemas, oauth2, models, utils
+from .. import schemas, oauth2, models, utils, pagination, permissions, instrumentation, export, importer, realtime, etags, responses, response_cache
 from ..config import settings
-from ..crud import users_crud, boards_crud
+from ..crud import users_crud, boards_crud, cards_crud, changes_crud
 
 
 router = APIRouter(
@@ -19,23 +23,85 @@ router = APIRouter(
 )
 
 
-@router.get("/", response_model=list[schemas.BoardOut])
-def get_boards(db: Annotated[Session, Depends(get_db)], current_user: Annotated[schemas.User, Depends(oauth2.get_current_user)], name: str = ""):
-    user_boards = boards_crud.get_boards_by_owner_id(db, current_user.id, name)
+@router.get("/", response_model=list[schemas.BoardOut], dependencies=[Depends(instrumentation.QueryBudget(3))])
+def get_boards(db: Annotated[Session, Depends(get_db)], current_user: Annotated[schemas.Principal, Depends(oauth2.get_current_principal)], response: Response, name: str = "", 
+               limit: Annotated[int, Query(ge=1, le=pagination.MAX_LIMIT)] = pagination.DEFAULT_LIMIT, after: str | None = None):
+    user_boards, next_cursor = boards_crud.get_boards_by_owner_id(db, current_user.id, name, limit, after)
+    pagination.set_next_cursor(response, next_cursor)
     return user_boards
 
 
 @router.get("/{board_id}", response_model=schemas.BoardOut)
-def get_board(board_id: int, db: Annotated[Session, Depends(get_db)], current_user: Annotated[schemas.User, Depends(oauth2.get_current_user)]):
+def get_board(board_id: int, db: Annotated[Session, Depends(get_db)], current_user: Annotated[schemas.Principal, Depends(oauth2.get_current_principal)], request: Request, response: Response):
     board = boards_crud.get_board_by_id(db, board_id)
     if board.owner_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="permission denied")
+    etags.check_not_modified(request, response, board)
     
     return board
 
 
+@router.get("/{board_id}/snapshot", response_model=schemas.BoardSnapshot)
+def get_board_snapshot(board_id: int, db: Annotated[Session, Depends(get_db)], access: Annotated[boards_crud.BoardPath, Depends(permissions.read_board)], request: Request, response: Response):
+    etags.check_not_modified(request, response, access.board)
+    cached = response_cache.lookup(request, access.board, response)
+    if cached is not None:
+        return cached
+    return response_cache.store(request, access.board, responses.fast_json(boards_crud.get_board_snapshot(db, access.board), response))
+
+
+@router.get("/{board_id}/search", response_model=list[schemas.CardSearchResult])
+def search_cards(board_id: int, db: Annotated[Session, Depends(get_db)], access: Annotated[boards_crud.BoardPath, Depends(permissions.read_board)], request: Request, response: Response, 
+                 q: Annotated[str, Query(min_length=1)], limit: Annotated[int, Query(ge=1, le=pagination.MAX_LIMIT)] = pagination.DEFAULT_LIMIT, after: str | None = None):
+    etags.check_not_modified(request, response, access.board)
+    results, next_cursor = cards_crud.search_cards(db, board_id, q, limit, after)
+    pagination.set_next_cursor(response, next_cursor)
+    return [schemas.CardSearchResult(**schemas.CardOut.from_orm(card).dict(), score=score) for card, score in results]
+
+
+# Incremental sync: follow next while has_more, a 410 means the client has to refetch the snapshot and start over
+@router.get("/{board_id}/changes", response_model=schemas.BoardChanges)
+def get_board_changes(board_id: int, db: Annotated[Session, Depends(get_db)], access: Annotated[boards_crud.BoardPath, Depends(permissions.read_board)], 
+                      since: Annotated[int | None, Query(ge=0)] = None, limit: Annotated[int, Query(ge=1, le=pagination.MAX_LIMIT)] = pagination.DEFAULT_LIMIT):
+    if since is None:
+        return changes_crud.get_change_cursor(db, access.board)
+    return changes_crud.get_changes(db, access.board, since, limit)
+
+
+@router.get("/{board_id}/export")
+def export_board(board_id: int, access: Annotated[boards_crud.BoardPath, Depends(permissions.read_board)], format: export.Format = export.Format.NDJSON):
+    return StreamingResponse(export.export_board(board_id, format), media_type=export.MEDIA_TYPES[format], 
+                             headers={"Content-Disposition": f'attachment; filename="board-{board_id}.{format.value}"'})
+
+
+# Pushes the board's change events; clients closed with realtime.SLOW_CONSUMER_CLOSE_CODE or sent a resync event must refetch,
+# members losing read access are closed with 1008
+@router.websocket("/{board_id}/ws")
+async def board_events(websocket: WebSocket, board_id: int, token: str):
+    try:
+        current_user = await run_in_threadpool(permissions.authorize_websocket, board_id, token, permissions.READ_ROLES)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    await realtime.stream(websocket, board_id, current_user.id)
+
+
+# The body is spooled to a temporary file while it arrives, the import then parses it incrementally off the event loop
+@router.post("/import", status_code=status.HTTP_201_CREATED, response_model=schemas.BoardImportOut)
+async def import_board(request: Request, db: Annotated[Session, Depends(get_db)], current_user: Annotated[schemas.Principal, Depends(oauth2.get_current_principal)]):
+    with tempfile.SpooledTemporaryFile(max_size=importer.SPOOL_SIZE) as body:
+        async for chunk in request.stream():
+            body.write(chunk)
+        body.seek(0)
+        try:
+            return await run_in_threadpool(importer.import_board, db, io.TextIOWrapper(body, encoding="utf-8"), current_user.id)
+        except importer.InvalidDocument as error:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(error))
+
+
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=schemas.BoardOut)
-def create_board(board: schemas.BoardCreate, db: Annotated[Session, Depends(get_db)], current_user: Annotated[schemas.User, Depends(oauth2.get_current_user)]):
+def create_board(board: schemas.BoardCreate, db: Annotated[Session, Depends(get_db)], current_user: Annotated[schemas.Principal, Depends(oauth2.get_current_principal)]):
     new_board = boards_crud.create_board(db, board, current_user.id)
     return new_board
 
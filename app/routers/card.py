@@ -1,10 +1,11 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, status, Response, HTTPException, Body
+from fastapi import APIRouter, Depends, status, Response, HTTPException, Body, Query, Request
 from sqlalchemy.orm import Session
 
 from ..database import get_db
-from .. import schemas, oauth2, models, utils
+from .. import schemas, oauth2, models, utils, permissions, pagination, ranking, etags, responses, response_cache
+from ..config import settings
 from ..crud import users_crud, boards_crud, lists_crud, cards_crud
 
 
@@ -15,77 +16,78 @@ router = APIRouter(
 
 
 @router.get("/{board_id}/lists/{list_id}/cards", response_model=list[schemas.CardOut])
-def get_cards(board_id: int, list_id: int, db: Annotated[Session, Depends(get_db)], current_user: Annotated[schemas.User, Depends(oauth2.get_current_user)]):
-    board = boards_crud.validate_board_presence(db, board_id)
-    users_crud.check_board_permissions(db, board, current_user.id, roles=[utils.Roles.ADMIN.value, utils.Roles.MEMBER.value, utils.Roles.OBSERVER.value])
-    _ = lists_crud.validate_list_presence(db, board_id, list_id)
-    cards = cards_crud.get_cards(db, list_id)
+def get_cards(board_id: int, list_id: int, db: Annotated[Session, Depends(get_db)], access: Annotated[boards_crud.BoardPath, Depends(permissions.read_list)], 
+              request: Request, response: Response, limit: Annotated[int, Query(ge=1, le=pagination.MAX_LIMIT)] = pagination.DEFAULT_LIMIT, after: str | None = None):
+    etags.check_not_modified(request, response, access.board)
+    cached = response_cache.lookup(request, access.board, response)
+    if cached is not None:
+        return cached
+    cards, next_cursor = cards_crud.get_cards(db, list_id, limit, after)
+    pagination.set_next_cursor(response, next_cursor)
 
-    return cards
+    return response_cache.store(request, access.board, responses.fast_json(cards, response))
 
 
 @router.get("/{board_id}/lists/{list_id}/cards/{card_id}", response_model=schemas.CardOut)
-def get_card(board_id: int, list_id: int, card_id: int, db: Annotated[Session, Depends(get_db)], current_user: Annotated[schemas.User, Depends(oauth2.get_current_user)]):
-    board = boards_crud.validate_board_presence(db, board_id)
-    users_crud.check_board_permissions(db, board, current_user.id, roles=[utils.Roles.ADMIN.value, utils.Roles.MEMBER.value, utils.Roles.OBSERVER.value])
-    _ = lists_crud.validate_list_presence(db, board_id, list_id)
-    card = cards_crud.validate_card_presence(db, list_id, card_id)
-    
-    return card
+def get_card(board_id: int, list_id: int, card_id: int, access: Annotated[boards_crud.BoardPath, Depends(permissions.read_card)], request: Request, response: Response):
+    etags.check_not_modified(request, response, access.board)
+    return access.card
 
 
 @router.post("/{board_id}/lists/{list_id}/cards", response_model=schemas.CardOut)
-def create_card(board_id: int, list_id: int, card: schemas.CardCreate, db: Annotated[Session, Depends(get_db)], current_user: Annotated[schemas.User, Depends(oauth2.get_current_user)]):
-    board = boards_crud.validate_board_presence(db, board_id)
-    users_crud.check_board_permissions(db, board, current_user.id, roles=[utils.Roles.ADMIN.value, utils.Roles.MEMBER.value])
-    _ = lists_crud.validate_list_presence(db, board_id, list_id)
+def create_card(board_id: int, list_id: int, card: schemas.CardCreate, db: Annotated[Session, Depends(get_db)], access: Annotated[boards_crud.BoardPath, Depends(permissions.write_list)]):
+    new_card = cards_crud.create_card(db, card, list_id, board_id)
 
-    unique_card = cards_crud.get_card_by_position_and_list_id(db, card.position, list_id)
-    if unique_card:
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="card with this position already exists")
+    return new_card
 
-    new_card = cards_crud.create_card(db, card, list_id)
 
-    return new_card
+@router.post("/{board_id}/lists/{list_id}/cards/bulk", response_model=list[schemas.CardOut])
+def create_cards(board_id: int, list_id: int, cards: Annotated[list[schemas.CardCreate], Body(min_items=1, max_items=settings.bulk_create_max_items)], db: Annotated[Session, Depends(get_db)], 
+                 access: Annotated[boards_crud.BoardPath, Depends(permissions.write_list)]):
+    new_cards = cards_crud.create_cards(db, cards, list_id, board_id)
 
+    return new_cards
 
 
-@router.get("/{board_id}/lists/{list_id}/cards/{card_id}/members", response_model=list[schemas.CardMember])
-def get_members(board_id: int, list_id: int, card_id: int, db: Annotated[Session, Depends(get_db)], current_user: Annotated[schemas.User, Depends(oauth2.get_current_user)]):
-    board = boards_crud.validate_board_presence(db, board_id)
-    users_crud.check_board_permissions(db, board, current_user.id, roles=[utils.Roles.ADMIN.value, utils.Roles.MEMBER.value])
-    _ = lists_crud.validate_list_presence(db, board_id, list_id)
-    _ = cards_crud.validate_card_presence(db, list_id, card_id)
 
+@router.get("/{board_id}/lists/{list_id}/cards/{card_id}/members", response_model=list[schemas.CardMember])
+def get_members(board_id: int, list_id: int, card_id: int, db: Annotated[Session, Depends(get_db)], access: Annotated[boards_crud.BoardPath, Depends(permissions.write_card)]):
     members = cards_crud.get_card_members(db, card_id)
 
     return members
 
 
 @router.post("/{board_id}/lists/{list_id}/cards/{card_id}/members", response_model=schemas.CardMemberOut)
-def add_member(board_id: int, list_id: int, card_id: int, member: schemas.CradMemberCreate, db: Annotated[Session, Depends(get_db)], current_user: Annotated[schemas.User, Depends(oauth2.get_current_user)]):
-    board = boards_crud.validate_board_presence(db, board_id)
-    users_crud.check_board_permissions(db, board, current_user.id, roles=[utils.Roles.ADMIN.value, utils.Roles.MEMBER.value])
-    _ = lists_crud.validate_list_presence(db, board_id, list_id)
-    _ = cards_crud.validate_card_presence(db, list_id, card_id)
-
-    new_member = cards_crud.add_card_member(db, card_id, member.user_id)
+def add_member(board_id: int, list_id: int, card_id: int, member: schemas.CradMemberCreate, db: Annotated[Session, Depends(get_db)], access: Annotated[boards_crud.BoardPath, Depends(permissions.write_card)]):
+    new_member = cards_crud.add_card_member(db, card_id, member.user_id, board_id)
 
     return new_member
 
 
 @router.delete("/{board_id}/lists/{list_id}/cards/{card_id}/members/{member_id}", status_code=status.HTTP_204_NO_CONTENT)
-def add_member(board_id: int, list_id: int, card_id: int, member_id: int, db: Annotated[Session, Depends(get_db)], current_user: Annotated[schemas.User, Depends(oauth2.get_current_user)]):
-    board = boards_crud.validate_board_presence(db, board_id)
-    users_crud.check_board_permissions(db, board, current_user.id, roles=[utils.Roles.ADMIN.value, utils.Roles.MEMBER.value])
-    _ = lists_crud.validate_list_presence(db, board_id, list_id)
-    _ = cards_crud.validate_card_presence(db, list_id, card_id)
+def add_member(board_id: int, list_id: int, card_id: int, member_id: int, db: Annotated[Session, Depends(get_db)], access: Annotated[boards_crud.BoardPath, Depends(permissions.write_card)]):
     member = cards_crud.get_card_memeber_by_id(db, card_id, member_id)
     if not member:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="member not found")
     
-    cards_crud.remove_card_member(db, card_id, member_id)
+    cards_crud.remove_card_member(db, card_id, member_id, board_id)
 
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
+@router.patch("/{board_id}/lists/{list_id}/cards/{card_id}/move", response_model=schemas.CardOut)
+def move_card(board_id: int, list_id: int, card_id: int, move: schemas.CardMove, db: Annotated[Session, Depends(get_db)], access: Annotated[boards_crud.BoardPath, Depends(permissions.write_card)]):
+    target_list_id = move.list_id if move.list_id is not None else list_id
+    if target_list_id != list_id:
+        _ = lists_crud.validate_list_presence(db, board_id, target_list_id)
+
+    after_rank, before_rank = cards_crud.get_neighbour_ranks(db, target_list_id, card_id, move.after_card_id, move.before_card_id)
+    moved_card = cards_crud.move_card(db, access.card, target_list_id, ranking.between(after_rank, before_rank), board_id)
+
+    return moved_card
+
+
+
+@router.patch("/{board_id}/cards/move", response_model=list[schemas.ListOrder])
+def bulk_move_cards(board_id: int, move: schemas.CardBulkMove, db: Annotated[Session, Depends(get_db)], access: Annotated[boards_crud.BoardPath, Depends(permissions.write_board)]):
+    return cards_crud.bulk_move_cards(db, board_id, move.operations)
@@ -1,10 +1,11 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, status, Response, HTTPException
+from fastapi import APIRouter, Depends, status, Response, HTTPException, Query, Body, Request
 from sqlalchemy.orm import Session
 
 from ..database import get_db
-from .. import schemas, oauth2, models, utils
+from .. import schemas, oauth2, models, utils, permissions, pagination, instrumentation, etags, responses, response_cache
+from ..config import settings
 from ..crud import users_crud, boards_crud, lists_crud, cards_crud, comments_crud
 
 
@@ -20,29 +21,44 @@ def create_comment(board_id: int,
                     card_id: int, 
                     comment: schemas.CommentCreate,
                     db: Annotated[Session, Depends(get_db)], 
-                    current_user: Annotated[schemas.User, Depends(oauth2.get_current_user)]):
-    board = boards_crud.validate_board_presence(db, board_id)
-    users_crud.check_board_permissions(db, board, current_user.id, roles=[utils.Roles.ADMIN.value, utils.Roles.MEMBER.value])
-    _ = lists_crud.validate_list_presence(db, board_id, list_id)
-    _ = cards_crud.validate_card_presence(db, list_id, card_id)
-    new_comment = comments_crud.create_comment(db, comment, card_id, current_user.id)
+                    current_user: Annotated[schemas.Principal, Depends(oauth2.get_current_principal)], 
+                    access: Annotated[boards_crud.BoardPath, Depends(permissions.write_card)]):
+    new_comment = comments_crud.create_comment(db, comment, card_id, current_user.id, board_id)
 
     return new_comment
 
 
-@router.get("/{board_id}/lists/{list_id}/cards/{card_id}/comments", response_model=list[schemas.CommentOut])
+@router.post("/{board_id}/lists/{list_id}/cards/{card_id}/comments/bulk", response_model=list[schemas.CommentOut])
+def create_comments(board_id: int, 
+                    list_id: int,
+                    card_id: int, 
+                    comments: Annotated[list[schemas.CommentCreate], Body(min_items=1, max_items=settings.bulk_create_max_items)],
+                    db: Annotated[Session, Depends(get_db)], 
+                    current_user: Annotated[schemas.Principal, Depends(oauth2.get_current_principal)], 
+                    access: Annotated[boards_crud.BoardPath, Depends(permissions.write_card)]):
+    new_comments = comments_crud.create_comments(db, comments, card_id, current_user.id, board_id)
+
+    return new_comments
+
+
+@router.get("/{board_id}/lists/{list_id}/cards/{card_id}/comments", response_model=list[schemas.CommentOut], dependencies=[Depends(instrumentation.QueryBudget(3))])
 def get_comments(board_id: int, 
                    list_id: int,
                    card_id: int,
                    db: Annotated[Session, Depends(get_db)], 
-                   current_user: Annotated[schemas.User, Depends(oauth2.get_current_user)]):
-    board = boards_crud.validate_board_presence(db, board_id)
-    users_crud.check_board_permissions(db, board, current_user.id, roles=[utils.Roles.ADMIN.value, utils.Roles.MEMBER.value, utils.Roles.OBSERVER.value])
-    _ = lists_crud.validate_list_presence(db, board_id, list_id)
-    _ = cards_crud.validate_card_presence(db, list_id, card_id)
-    comments = comments_crud.get_comments(db, card_id)
+                   access: Annotated[boards_crud.BoardPath, Depends(permissions.read_card)], 
+                   request: Request, 
+                   response: Response, 
+                   limit: Annotated[int, Query(ge=1, le=pagination.MAX_LIMIT)] = pagination.DEFAULT_LIMIT, 
+                   after: str | None = None):
+    etags.check_not_modified(request, response, access.board)
+    cached = response_cache.lookup(request, access.board, response)
+    if cached is not None:
+        return cached
+    comments, next_cursor = comments_crud.get_comments(db, card_id, limit, after)
+    pagination.set_next_cursor(response, next_cursor)
 
-    return comments
+    return response_cache.store(request, access.board, responses.fast_json(comments, response))
 
 
 @router.delete("/{board_id}/lists/{list_id}/cards/{card_id}/comments/{comment_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -51,16 +67,12 @@ def get_comments(board_id: int,
                    card_id: int,
                    comment_id: int,
                    db: Annotated[Session, Depends(get_db)], 
-                   current_user: Annotated[schemas.User, Depends(oauth2.get_current_user)]):
-    board = boards_crud.validate_board_presence(db, board_id)
-    users_crud.check_board_permissions(db, board, current_user.id, roles=[utils.Roles.ADMIN.value, utils.Roles.MEMBER.value])
-    _ = lists_crud.validate_list_presence(db, board_id, list_id)
-    _ = cards_crud.validate_card_presence(db, list_id, card_id)
-
+                   current_user: Annotated[schemas.Principal, Depends(oauth2.get_current_principal)], 
+                   access: Annotated[boards_crud.BoardPath, Depends(permissions.write_card)]):
     comment = comments_crud.get_user_comment(db, card_id, comment_id, current_user.id)
     if not comment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="comment not found")
-    comments_crud.delete_comment(db, comment_id)
+    comments_crud.delete_comment(db, comment_id, card_id, board_id)
 
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
@@ -72,16 +84,12 @@ def get_comments(board_id: int,
                    comment_id: int,
                    updated_comment: schemas.CommentCreate,
                    db: Annotated[Session, Depends(get_db)], 
-                   current_user: Annotated[schemas.User, Depends(oauth2.get_current_user)]):
-    board = boards_crud.validate_board_presence(db, board_id)
-    users_crud.check_board_permissions(db, board, current_user.id, roles=[utils.Roles.ADMIN.value, utils.Roles.MEMBER.value])
-    _ = lists_crud.validate_list_presence(db, board_id, list_id)
-    _ = cards_crud.validate_card_presence(db, list_id, card_id)
-    
+                   current_user: Annotated[schemas.Principal, Depends(oauth2.get_current_principal)], 
+                   access: Annotated[boards_crud.BoardPath, Depends(permissions.write_card)]):
     comment = comments_crud.get_user_comment(db, card_id, comment_id, current_user.id)
     if not comment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="comment not found")
-    comments_crud.update_comment(db, updated_comment, comment_id)
+    comments_crud.update_comment(db, updated_comment, comment_id, card_id, board_id)
     return comment
 
     
@@ -1,10 +1,11 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, status, Response, HTTPException
+from fastapi import APIRouter, Depends, status, Response, HTTPException, Body, Request
 from sqlalchemy.orm import Session
 
 from ..database import get_db
-from .. import schemas, oauth2, models, utils
+from .. import schemas, oauth2, models, utils, permissions, ranking, etags, responses, response_cache
+from ..config import settings
 from ..crud import users_crud, boards_crud, lists_crud
 
 
@@ -15,32 +16,49 @@ router = APIRouter(
 
 
 @router.get("/{board_id}/lists", response_model=list[schemas.ListOut])
-def get_lists(board_id: int, db: Annotated[Session, Depends(get_db)], current_user: Annotated[schemas.User, Depends(oauth2.get_current_user)]):
+def get_lists(board_id: int, db: Annotated[Session, Depends(get_db)], current_user: Annotated[schemas.Principal, Depends(oauth2.get_current_principal)], request: Request, response: Response):
     board = boards_crud.validate_board_presence(db, board_id)
     users_crud.check_board_permissions(db, board, current_user.id, roles=[utils.Roles.ADMIN.value, utils.Roles.MEMBER.value, utils.Roles.OBSERVER.value])
+    etags.check_not_modified(request, response, board)
+    cached = response_cache.lookup(request, board, response)
+    if cached is not None:
+        return cached
     lists = lists_crud.get_lists_by_board_id(db, board_id)
 
-    return lists
+    return response_cache.store(request, board, responses.fast_json(lists, response))
 
 
 @router.get("/{board_id}/lists/{list_id}", response_model=schemas.ListOut)
-def get_list(board_id: int, list_id: int, db: Annotated[Session, Depends(get_db)], current_user: Annotated[schemas.User, Depends(oauth2.get_current_user)]):
+def get_list(board_id: int, list_id: int, db: Annotated[Session, Depends(get_db)], current_user: Annotated[schemas.Principal, Depends(oauth2.get_current_principal)], request: Request, response: Response):
     board = boards_crud.validate_board_presence(db, board_id)
     users_crud.check_board_permissions(db, board, current_user.id, roles=[utils.Roles.ADMIN.value, utils.Roles.MEMBER.value, utils.Roles.OBSERVER.value])
+    etags.check_not_modified(request, response, board)
     list = lists_crud.validate_list_presence(db, board_id, list_id)
     
     return list
 
 
 @router.post("/{board_id}/lists", status_code=status.HTTP_201_CREATED, response_model=schemas.ListOut)
-def create_list(board_id: int, list: schemas.ListCreate, db: Annotated[Session, Depends(get_db)], current_user: Annotated[schemas.User, Depends(oauth2.get_current_user)]):
+def create_list(board_id: int, list: schemas.ListCreate, db: Annotated[Session, Depends(get_db)], current_user: Annotated[schemas.Principal, Depends(oauth2.get_current_principal)]):
     board = boards_crud.validate_board_presence(db, board_id)
     users_crud.check_board_permissions(db, board, current_user.id, roles=[utils.Roles.ADMIN.value, utils.Roles.MEMBER.value])
 
-    unique_list = lists_crud.get_list_by_position_and_board_id(db, list.position, board_id)
-    if unique_list:
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="list with this position already exists")
-    
     new_list = lists_crud.create_list(db, list, board_id)
 
-    return new_list
\ No newline at end of file
+    return new_list
+
+
+@router.post("/{board_id}/lists/bulk", status_code=status.HTTP_201_CREATED, response_model=list[schemas.ListOut])
+def create_lists(board_id: int, lists: Annotated[list[schemas.ListCreate], Body(min_items=1, max_items=settings.bulk_create_max_items)], db: Annotated[Session, Depends(get_db)], 
+                 access: Annotated[boards_crud.BoardPath, Depends(permissions.write_board)]):
+    new_lists = lists_crud.create_lists(db, lists, board_id)
+
+    return new_lists
+
+
+@router.patch("/{board_id}/lists/{list_id}/move", response_model=schemas.ListOut)
+def move_list(board_id: int, list_id: int, move: schemas.ListMove, db: Annotated[Session, Depends(get_db)], access: Annotated[boards_crud.BoardPath, Depends(permissions.write_list)]):
+    after_rank, before_rank = lists_crud.get_neighbour_ranks(db, board_id, list_id, move.after_list_id, move.before_list_id)
+    moved_list = lists_crud.move_list(db, access.list, ranking.between(after_rank, before_rank))
+
+    return moved_list
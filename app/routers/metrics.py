@@ -0,0 +1,41 @@
+import anyio
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from .. import oauth2, database, realtime, response_cache, metrics
+from ..crud import users_crud
+
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=['metrics'],
+    dependencies=[Depends(oauth2.verify_metrics_token)]
+)
+
+
+# Prometheus text exposition of the request and pool histograms
+@router.get("", response_class=PlainTextResponse)
+def get_prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/caches")
+def get_cache_metrics():
+    return {"board_roles": users_crud.board_roles.stats(), 
+            "principals": oauth2.principals.stats(), 
+            "verified_tokens": oauth2.verified_tokens.stats(), 
+            "responses": response_cache.backend.stats() if response_cache.backend is not None else None}
+
+
+
+@router.get("/pool")
+async def get_pool_metrics():
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    return {"sync": database.pool_status(database.engine.pool), 
+            "async": database.pool_status(database.async_engine.sync_engine.pool), 
+            "threadpool": {"total": limiter.total_tokens, "borrowed": limiter.borrowed_tokens}}
+
+
+@router.get("/realtime")
+def get_realtime_metrics():
+    return realtime.broker.stats()
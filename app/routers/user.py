@@ -1,11 +1,11 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, status, Response, HTTPException
+from fastapi import APIRouter, Depends, status, Response, HTTPException, Query
 from sqlalchemy.orm import Session
 
-from ..database import get_db
-from .. import schemas, oauth2
-from ..crud import users_crud
+from ..database import get_session
+from .. import schemas, oauth2, utils, pagination
+from ..crud import aio
 
 
 router = APIRouter(
@@ -15,20 +15,22 @@ router = APIRouter(
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=schemas.UserOut)
-async def create_user(user: schemas.UserCreate, db: Annotated[Session, Depends(get_db)]):
-    unique_user = users_crud.get_user_by_email(db, user.email)
+async def create_user(user: schemas.UserCreate, db: Annotated[Session, Depends(get_session)]):
+    unique_user = await aio.users_crud.get_user_by_email(db, user.email)
     if unique_user:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"this email already exists")
-    unique_username = users_crud.get_user_by_username(db, user.username)
+    unique_username = await aio.users_crud.get_user_by_username(db, user.username)
     if unique_username:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Username is taken")
     
-    new_user = users_crud.create_user(db, user)
+    user.password = await utils.hash_async(user.password)
+    new_user = await aio.users_crud.create_user(db, user)
     
     return new_user
 
 
 @router.get("/", response_model=list[schemas.UserOut])
-async def get_users(db: Annotated[Session, Depends(get_db)]):
-    users = users_crud.get_users(db)
+async def get_users(db: Annotated[Session, Depends(get_session)], response: Response, limit: Annotated[int, Query(ge=1, le=pagination.MAX_LIMIT)] = pagination.DEFAULT_LIMIT, after: str | None = None):
+    users, next_cursor = await aio.users_crud.get_users(db, limit, after)
+    pagination.set_next_cursor(response, next_cursor)
     return users
\ No newline at end of file
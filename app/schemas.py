@@ -35,6 +35,10 @@ class TokenData(BaseModel):
     uid: str | None = None
 
 
+class Principal(BaseModel):
+    id: int
+
+
 class BoardBase(BaseModel):
     name: str
     
@@ -54,6 +58,7 @@ class ListCreate(ListBase):
 
 class ListOut(ListBase):
     id: int
+    rank: str
     created_at: datetime
     board_id: int
 
@@ -73,6 +78,31 @@ class BoardOut(BoardBase):
         orm_mode = True
 
 
+class BoardChange(BaseModel):
+    seq: int
+    entity: str
+    id: str
+    op: str
+    data: dict | None = None
+
+
+class BoardChanges(BaseModel):
+    since: int | None = None
+    next: int
+    has_more: bool
+    changes: list[BoardChange]
+
+
+class BoardImportOut(BaseModel):
+    board_id: int
+    boards: int
+    board_members: int
+    lists: int
+    cards: int
+    card_members: int
+    comments: int
+
+
 class CardBase(BaseModel):
     title: str
     description: str | None = None
@@ -86,6 +116,7 @@ class CardCreate(CardBase):
 
 class CardOut(CardBase):
     id: int
+    rank: str
     list_id: int
     created_at: datetime
 
@@ -93,6 +124,36 @@ class CardOut(CardBase):
         orm_mode = True
 
 
+class CardMove(BaseModel):
+    list_id: int | None = None
+    after_card_id: int | None = None
+    before_card_id: int | None = None
+
+
+class CardMoveOperation(BaseModel):
+    card_id: int
+    list_id: int
+    position: int = Field(ge=0, description="Index of the card in the target list after the move")
+
+
+class CardBulkMove(BaseModel):
+    operations: list[CardMoveOperation] = Field(min_items=1, max_items=5000)
+
+
+class ListOrder(BaseModel):
+    list_id: int
+    card_ids: list[int]
+
+
+class ListMove(BaseModel):
+    after_list_id: int | None = None
+    before_list_id: int | None = None
+
+
+class CardSearchResult(CardOut):
+    score: float
+
+
 class CardMemberOut(BaseModel):
     card_id: int
     user_id: int
@@ -115,6 +176,19 @@ class CradMemberCreate(BaseModel):
     user_id: int
 
 
+class CardSnapshot(CardOut):
+    members: list[CardMember]
+    comment_count: int
+
+
+class ListSnapshot(ListOut):
+    cards: list[CardSnapshot]
+
+
+class BoardSnapshot(BoardOut):
+    lists: list[ListSnapshot]
+
+
 
 class CommentBase(BaseModel):
     comment_text: str
@@ -152,5 +226,15 @@ class InvitationCreate(BaseModel):
     recipient_email: str
 
 
+class InvitationBatchCreate(BaseModel):
+    recipient_emails: list[str] = Field(min_items=1, max_items=500)
+
+
+class InvitationBatchOut(BaseModel):
+    invited: list[str]
+    already_invited: list[str]
+    not_found: list[str]
+
+
 
 
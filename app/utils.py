@@ -1,9 +1,22 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from enum import Enum
 
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 
+from .config import settings
 
-pwd_contenxt = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+pwd_contenxt = CryptContext(schemes=["bcrypt"], deprecated="auto", 
+                            bcrypt__default_rounds=settings.password_hash_rounds, 
+                            bcrypt__min_rounds=settings.password_hash_rounds, 
+                            bcrypt__max_rounds=settings.password_hash_rounds)
+
+# bcrypt runs on a dedicated pool so it neither blocks the event loop nor starves the shared threadpool
+password_executor = None
+password_slots = threading.BoundedSemaphore(settings.password_hash_workers + settings.password_hash_queue_depth)
 
 
 def hash(password: str):
@@ -14,7 +27,46 @@ def verify(plain_password, hash_password):
     return pwd_contenxt.verify(plain_password, hash_password)
 
 
+def verify_and_update(plain_password, hash_password):
+    return pwd_contenxt.verify_and_update(plain_password, hash_password)
+
+
+def get_password_executor():
+    global password_executor
+    if password_executor is None:
+        if settings.password_hash_executor == "process":
+            password_executor = ProcessPoolExecutor(max_workers=settings.password_hash_workers)
+        else:
+            password_executor = ThreadPoolExecutor(max_workers=settings.password_hash_workers, thread_name_prefix="password-hash")
+    return password_executor
+
+
+def shutdown_password_executor():
+    global password_executor
+    if password_executor is not None:
+        password_executor.shutdown(wait=False, cancel_futures=True)
+        password_executor = None
+
+
+async def run_password_task(func, *args):
+    if not password_slots.acquire(blocking=False):
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="too many password operations in progress, try again later")
+    try:
+        return await asyncio.get_running_loop().run_in_executor(get_password_executor(), func, *args)
+    finally:
+        password_slots.release()
+
+
+async def hash_async(password: str):
+    return await run_password_task(hash, password)
+
+
+async def verify_async(plain_password, hash_password):
+    # returns (valid, new_hash), new_hash is set when the stored hash uses outdated settings
+    return await run_password_task(verify_and_update, plain_password, hash_password)
+
+
 class Roles(str, Enum):
     ADMIN = "admin"
     MEMBER = "member"
-    OBSERVER = "observer"
\ No newline at end of file
+    OBSERVER = "observer"
@@ -0,0 +1,73 @@
+"""Bulk move benchmark.
+
+Seeds a board with two lists and CARDS cards inside a transaction, then moves
+every card to the other list, once with a single bulk move and once card by
+card the way the single move endpoint does it. Everything is rolled back at
+the end.
+
+    python -m scripts.benchmark_bulk_move [CARDS]
+"""
+import sys
+import time
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app import ranking, schemas
+from app.crud import cards_crud
+from app.database import engine
+
+
+BOARD_ID = 900000001
+SOURCE_LIST_ID = 900000001
+TARGET_LIST_ID = 900000002
+
+
+def seed(connection, cards: int):
+    connection.execute(text("INSERT INTO users (id, username, email, password) VALUES (:id, 'bench', 'bench@example.com', 'x')"), {"id": BOARD_ID})
+    connection.execute(text("INSERT INTO boards (id, name, owner_id) VALUES (:id, 'bench', :id)"), {"id": BOARD_ID})
+    connection.execute(text("INSERT INTO lists (id, name, position, rank, board_id) VALUES (:source, 'source', 1, 'a', :board), (:target, 'target', 2, 'b', :board)"),
+                       {"source": SOURCE_LIST_ID, "target": TARGET_LIST_ID, "board": BOARD_ID})
+    connection.execute(text("INSERT INTO cards (id, title, position, rank, list_id) VALUES (:id, 'card', :position, :rank, :list_id)"),
+                       [{"id": 900000000 + i, "position": i, "rank": rank, "list_id": SOURCE_LIST_ID} for i, rank in enumerate(ranking.spread(cards))])
+
+
+def card_ids(db: Session, list_id: int):
+    return [card_id for (card_id,) in db.execute(text("SELECT id FROM cards WHERE list_id = :list_id ORDER BY rank"), {"list_id": list_id}).all()]
+
+
+def bulk(db: Session, ids: list[int], list_id: int):
+    operations = [schemas.CardMoveOperation(card_id=card_id, list_id=list_id, position=position) for position, card_id in enumerate(ids)]
+    cards_crud.bulk_move_cards(db, BOARD_ID, operations)
+
+
+def one_by_one(db: Session, ids: list[int], list_id: int):
+    previous_id = None
+    for card_id in ids:
+        card = cards_crud.get_card(db, SOURCE_LIST_ID if list_id == TARGET_LIST_ID else TARGET_LIST_ID, card_id)
+        after_rank, before_rank = cards_crud.get_neighbour_ranks(db, list_id, card_id, previous_id)
+        cards_crud.move_card(db, card, list_id, ranking.between(after_rank, before_rank), BOARD_ID)
+        previous_id = card_id
+
+
+def main():
+    cards = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            seed(connection, cards)
+            # Commits inside crud functions only release a savepoint, the outer transaction is rolled back
+            with Session(bind=connection, join_transaction_mode="create_savepoint") as db:
+                for name, move, source, target in [("bulk", bulk, SOURCE_LIST_ID, TARGET_LIST_ID), ("one by one", one_by_one, TARGET_LIST_ID, SOURCE_LIST_ID)]:
+                    ids = card_ids(db, source)
+                    started = time.perf_counter()
+                    move(db, ids, target)
+                    elapsed = time.perf_counter() - started
+                    assert card_ids(db, target) == ids
+                    print(f"{name}\t{cards} cards\t{elapsed:.3f}s\t{cards / elapsed:.0f} cards/s")
+        finally:
+            transaction.rollback()
+
+
+if __name__ == "__main__":
+    main()
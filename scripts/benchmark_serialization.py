@@ -0,0 +1,79 @@
+"""Card list serialization benchmark.
+
+Seeds a list with CARDS cards inside a transaction and renders it the way
+GET /boards/{board_id}/lists/{list_id}/cards used to (ORM objects validated
+into CardOut models, jsonable_encoder, json.dumps) and the way it does now
+(row dicts encoded by orjson). Prints the best of ROUNDS runs for each path,
+split into fetching and encoding. Everything is rolled back at the end.
+
+    python -m scripts.benchmark_serialization [CARDS] [ROUNDS]
+"""
+import sys
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import parse_obj_as
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app import models, ranking, schemas
+from app.crud import cards_crud
+from app.database import engine
+
+
+BOARD_ID = 900000001
+LIST_ID = 900000001
+
+
+def seed(connection, cards: int):
+    connection.execute(text("INSERT INTO users (id, username, email, password) VALUES (:id, 'bench', 'bench@example.com', 'x')"), {"id": BOARD_ID})
+    connection.execute(text("INSERT INTO boards (id, name, owner_id) VALUES (:id, 'bench', :id)"), {"id": BOARD_ID})
+    connection.execute(text("INSERT INTO lists (id, name, position, rank, board_id) VALUES (:id, 'bench', 1, 'a', :board)"), {"id": LIST_ID, "board": BOARD_ID})
+    connection.execute(text("INSERT INTO cards (id, title, description, position, rank, due_date, list_id) VALUES (:id, :title, 'some description', :position, :rank, now(), :list_id)"),
+                       [{"id": 900000000 + i, "title": f"card {i}", "position": i, "rank": rank, "list_id": LIST_ID} for i, rank in enumerate(ranking.spread(cards))])
+
+
+def orm_path(db: Session, cards: int):
+    return db.query(models.Card).filter(models.Card.list_id == LIST_ID).order_by(models.Card.rank).limit(cards).all()
+
+
+def orm_encode(rows):
+    return JSONResponse(jsonable_encoder(parse_obj_as(list[schemas.CardOut], rows))).body
+
+
+def rows_path(db: Session, cards: int):
+    return cards_crud.get_cards(db, LIST_ID, cards)[0]
+
+
+def rows_encode(rows):
+    return ORJSONResponse(rows).body
+
+
+def measure(db: Session, fetch, encode, cards: int):
+    db.expunge_all()
+    started = time.perf_counter()
+    rows = fetch(db, cards)
+    fetched = time.perf_counter()
+    body = encode(rows)
+    return fetched - started, time.perf_counter() - fetched, len(body)
+
+
+def main():
+    cards = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            seed(connection, cards)
+            with Session(bind=connection) as db:
+                for name, fetch, encode in [("orm + pydantic + json", orm_path, orm_encode), ("rows + orjson", rows_path, rows_encode)]:
+                    fetch_time, encode_time, size = min((measure(db, fetch, encode, cards) for _ in range(rounds)), key=lambda run: run[0] + run[1])
+                    print(f"{name}\t{cards} cards\tfetch {fetch_time * 1000:.1f}ms\tencode {encode_time * 1000:.1f}ms\t"
+                          f"total {(fetch_time + encode_time) * 1000:.1f}ms\t{size} bytes")
+        finally:
+            transaction.rollback()
+
+
+if __name__ == "__main__":
+    main()
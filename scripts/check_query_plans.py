@@ -0,0 +1,70 @@
+"""Query plan regression check.
+
+Seeds a board-sized dataset inside a transaction, runs EXPLAIN for the hot
+filters and fails if any of them falls back to a sequential scan. Everything
+is rolled back at the end.
+
+    python -m scripts.check_query_plans
+"""
+import json
+import sys
+
+from sqlalchemy import text
+
+from app.database import engine
+
+
+SEED = [
+    "INSERT INTO users (id, username, email, password) SELECT 900000000 + g, 'plan' || g, 'plan' || g || '@example.com', 'x' FROM generate_series(1, 2000) g",
+    "INSERT INTO boards (id, name, owner_id) SELECT 900000000 + g, 'board ' || g, 900000000 + (g % 2000) + 1 FROM generate_series(1, 2000) g",
+    "INSERT INTO board_members (user_id, board_id, role) SELECT 900000000 + (g % 2000) + 1, 900000000 + (g % 2000) + 1, 'member' FROM generate_series(1, 2000) g",
+    "INSERT INTO lists (id, name, position, rank, board_id) SELECT 900000000 + g, 'list ' || g, g, lpad(g::text, 8, '0'), 900000000 + (g % 2000) + 1 FROM generate_series(1, 20000) g",
+    "INSERT INTO cards (id, title, position, rank, list_id, due_date) SELECT 900000000 + g, 'card ' || g, g, lpad(g::text, 8, '0'), 900000000 + (g % 20000) + 1, now() + g * interval '1 minute' FROM generate_series(1, 200000) g",
+    "INSERT INTO card_members (user_id, card_id) SELECT 900000000 + (g % 2000) + 1, 900000000 + g FROM generate_series(1, 200000) g",
+    "INSERT INTO comments (comment_text, card_id, user_id) SELECT 'comment ' || g, 900000000 + (g % 200000) + 1, 900000000 + (g % 2000) + 1 FROM generate_series(1, 400000) g",
+    "ANALYZE users, boards, board_members, lists, cards, card_members, comments",
+]
+
+CHECKS = {
+    "boards by owner": "SELECT * FROM boards WHERE owner_id = 900000001 ORDER BY id LIMIT 51",
+    "members of board": "SELECT * FROM board_members WHERE board_id = 900000001",
+    "lists of board": "SELECT * FROM lists WHERE board_id = 900000001 ORDER BY rank",
+    "cards of list": "SELECT * FROM cards WHERE list_id = 900000001 ORDER BY rank LIMIT 51",
+    "cards due soon": "SELECT * FROM cards WHERE due_date < now() + interval '10 minutes'",
+    "members of card": "SELECT * FROM card_members WHERE card_id = 900000001",
+    "comments of card": "SELECT * FROM comments WHERE card_id = 900000001 ORDER BY created_at, id LIMIT 51",
+    "comments of user": "SELECT * FROM comments WHERE user_id = 900000001",
+}
+
+
+def seq_scans(plan):
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+def main():
+    failures = []
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            for statement in SEED:
+                connection.execute(text(statement))
+            for name, query in CHECKS.items():
+                plan = connection.execute(text(f"EXPLAIN (FORMAT JSON) {query}")).scalar()
+                plan = plan if isinstance(plan, list) else json.loads(plan)
+                scans = seq_scans(plan[0]["Plan"])
+                print(f"{'FAIL' if scans else 'ok'}\t{name}" + (f"\tseq scan on {', '.join(scans)}" if scans else ""))
+                if scans:
+                    failures.append(name)
+        finally:
+            transaction.rollback()
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
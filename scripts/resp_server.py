@@ -0,0 +1,97 @@
+"""Local stand-in Redis server.
+
+Keeps everything in memory and implements only the commands the response
+cache sends (PING, HGET, HSET, PEXPIRE, DEL, FLUSHALL). Point the app at it
+for development and tests:
+
+    RESPONSE_CACHE_BACKEND=redis RESPONSE_CACHE_REDIS_PORT=6380
+    python -m scripts.resp_server [PORT]
+"""
+import asyncio
+import sys
+import time
+
+
+hashes = {}
+expires = {}
+
+
+def encode(value):
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, int):
+        return f":{value}\r\n".encode()
+    return f"${len(value)}\r\n".encode() + value + b"\r\n"
+
+
+def get_hash(key: bytes):
+    if key in expires and expires[key] <= time.monotonic():
+        hashes.pop(key, None)
+        expires.pop(key, None)
+    return hashes.get(key)
+
+
+def execute(command: list[bytes]):
+    name, args = command[0].upper(), command[1:]
+    if name == b"PING":
+        return b"+PONG\r\n"
+    if name == b"HGET" and len(args) == 2:
+        return encode((get_hash(args[0]) or {}).get(args[1]))
+    if name == b"HSET" and len(args) >= 3 and len(args) % 2 == 1:
+        fields = hashes.setdefault(args[0], get_hash(args[0]) or {})
+        added = sum(field not in fields for field in args[1::2])
+        fields.update(zip(args[1::2], args[2::2]))
+        return encode(added)
+    if name == b"PEXPIRE" and len(args) == 2:
+        if get_hash(args[0]) is None:
+            return encode(0)
+        expires[args[0]] = time.monotonic() + int(args[1]) / 1000
+        return encode(1)
+    if name == b"DEL":
+        deleted = 0
+        for key in args:
+            deleted += get_hash(key) is not None
+            hashes.pop(key, None)
+            expires.pop(key, None)
+        return encode(deleted)
+    if name == b"FLUSHALL":
+        hashes.clear()
+        expires.clear()
+        return b"+OK\r\n"
+    return f"-ERR unknown command '{name.decode(errors='replace')}'\r\n".encode()
+
+
+async def read_command(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        return line.split()
+    command = []
+    for _ in range(int(line[1:])):
+        length = int((await reader.readline())[1:])
+        command.append((await reader.readexactly(length + 2))[:-2])
+    return command
+
+
+async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        while (command := await read_command(reader)) is not None:
+            if command:
+                writer.write(execute(command))
+                await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def main(port: int):
+    server = await asyncio.start_server(handle, "localhost", port)
+    print(f"resp server listening on localhost:{port}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 6380))
@@ -0,0 +1,58 @@
+"""Local stand-in SMTP server.
+
+Accepts every message and prints it, nothing is delivered. Point the app at
+it for development and tests:
+
+    SMTP_HOST=localhost SMTP_PORT=1025 SMTP_STARTTLS=false SMTP_LOGIN=false
+    python -m scripts.smtp_sink [PORT]
+"""
+import asyncio
+import sys
+
+
+async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    async def reply(line: str):
+        writer.write(f"{line}\r\n".encode())
+        await writer.drain()
+
+    await reply("220 smtp-sink ready")
+    sender, recipients = None, []
+    try:
+        while line := await reader.readline():
+            command = line.decode(errors="replace").strip()
+            verb = command[:4].upper()
+            if verb in ("HELO", "EHLO"):
+                await reply("250 smtp-sink")
+            elif verb == "MAIL":
+                sender, recipients = command[10:], []
+                await reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command[8:])
+                await reply("250 OK")
+            elif verb == "DATA":
+                await reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while (data := await reader.readline()) not in (b".\r\n", b".\n", b""):
+                    lines.append(data.decode(errors="replace"))
+                print(f"--- message from {sender} to {', '.join(recipients)}\n{''.join(lines)}", flush=True)
+                await reply("250 OK queued")
+            elif verb in ("NOOP", "RSET"):
+                await reply("250 OK")
+            elif verb == "QUIT":
+                await reply("221 Bye")
+                break
+            else:
+                await reply("502 Command not implemented")
+    finally:
+        writer.close()
+
+
+async def main(port: int):
+    server = await asyncio.start_server(handle, "localhost", port)
+    print(f"smtp sink listening on localhost:{port}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1025))